@@ -0,0 +1,21 @@
+import click
+
+from mpscanner.app import create_app
+from mpscanner.extensions import mongo
+from mpscanner.blueprints.analyze.indexes import ensure_indexes
+
+
+@click.command()
+def cli():
+    """
+    Create the Mongo indexes the reports and crawler rely on.
+
+    :return: None
+    """
+    app = create_app()
+
+    with app.app_context():
+        for collection, names in ensure_indexes(mongo.db).items():
+            click.echo('{0}: {1}'.format(collection, ', '.join(names)))
+
+    return None
@@ -0,0 +1,20 @@
+import click
+
+from mpscanner.app import create_app
+from mpscanner.extensions import mongo
+from mpscanner.blueprints.analyze.summary import rebuild
+
+
+@click.command()
+def cli():
+    """
+    Rebuild the site and batch report summaries from every scanned page.
+
+    :return: None
+    """
+    app = create_app()
+
+    with app.app_context():
+        click.echo('Summarized {0} pages'.format(rebuild(mongo.db)))
+
+    return None
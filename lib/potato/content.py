@@ -0,0 +1,77 @@
+'''
+Describe the written content of a webpage: how much there is, how varied it
+is, what it is about and how hard it is to read. Every statistic is gathered
+in one pass over the page's visible text.
+'''
+
+__author__ = 'Kevin Tarvin'
+import re
+from collections import Counter
+from lib.potato.document import asDocument
+from lib.potato.lang import pageText
+
+TOKEN = re.compile(r'\S+')
+VOWELS = re.compile(r'[aeiouy]+')
+SENTENCE_END = ('.', '!', '?')
+
+
+def syllables(word):
+    '''
+    Estimate the syllables in a word by counting groups of vowels
+
+    :param letters: the word with everything but ascii letters removed
+    :param groups: number of vowel groups in the word
+    :return: integer estimate, at least 1 for any word with letters
+    '''
+    letters = ''.join(c for c in word if 'a' <= c <= 'z')
+    if not letters:
+        return 0
+    groups = len(VOWELS.findall(letters))
+    # a trailing silent e rarely adds a syllable
+    if letters.endswith('e') and not letters.endswith('le') and groups > 1:
+        groups -= 1
+    return max(groups, 1)
+
+
+def contentStats(html, parser=None, top=10):
+    '''
+    Gather content statistics from a webpage in a single streaming pass over
+    its visible text. Reading levels use the Flesch formulas, which are only
+    calibrated for English text.
+
+    :param html: HTML of webpage as string or a parsed Document
+    :param parser: parser backend used when html is still a string
+    :param top: how many of the most frequent terms to report
+    :param text: visible text of the webpage as one string
+    :param counts: Counter of lower cased words and their frequency
+    :param sentences: number of words closing a sentence
+    :param syllableCount: estimated syllables across every word
+    :return: dictionary of content statistics
+    '''
+    document = asDocument(html, None, parser)
+    text = pageText(document)
+    counts = Counter()
+    sentences = 0
+    syllableCount = 0
+    for match in TOKEN.finditer(text.lower()):
+        word = match.group()
+        counts[word] += 1
+        syllableCount += syllables(word)
+        if word.endswith(SENTENCE_END):
+            sentences += 1
+    words = sum(counts.values())
+    htmlLength = len(document.html)
+    stats = {'words': words,
+             'unique_words': len(counts),
+             'top_terms': [[term, n] for term, n in counts.most_common(top)],
+             'text_html_ratio': len(text) / htmlLength if htmlLength else 0,
+             'reading_ease': None,
+             'grade_level': None}
+    if words:
+        wordsPerSentence = words / max(sentences, 1)
+        syllablesPerWord = syllableCount / words
+        stats['reading_ease'] = round(
+            206.835 - 1.015 * wordsPerSentence - 84.6 * syllablesPerWord, 2)
+        stats['grade_level'] = round(
+            0.39 * wordsPerSentence + 11.8 * syllablesPerWord - 15.59, 2)
+    return stats
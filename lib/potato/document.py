@@ -0,0 +1,124 @@
+'''
+Document is a webpage parsed a single time and shared by every potato
+extractor, so one fetched response is never handed to the HTML parser twice.
+
+Parsing goes through one of the BeautifulSoup tree builders listed in
+PARSERS. lxml is C-backed and is the default; html5lib is much slower but
+repairs badly broken markup the way a browser would, so it stays available
+as a fallback.
+
+Huge pages can be parsed in head-only mode, which keeps the whole <head>,
+where most of what potato extracts lives, and only the start of the body.
+'''
+
+__author__ = 'Kevin Tarvin'
+import re
+from bs4 import BeautifulSoup, NavigableString, CData, Tag
+
+EMPTY = '<html><head></head><body></body></html>'
+HEAD_END = re.compile(r'</head\s*>', re.IGNORECASE)
+PARSERS = ('lxml', 'html5lib')
+DEFAULT_PARSER = 'lxml'
+FALLBACK_PARSER = 'html5lib'
+
+
+class Document(object):
+    '''
+    A webpage's HTML along with its parsed BeautifulSoup tree
+
+    :param hidden: tags whose text is never rendered to a visitor
+    '''
+    hidden = ('script', 'style', 'noscript')
+
+    def __init__(self, html, url, parser=None, bodyChars=None):
+        '''
+        Parse the webpage's HTML string into a BeautifulSoup object. If the
+        chosen parser fails, html5lib is tried before settling for an empty
+        document.
+
+        :param html: an HTML webpage as a string
+        :param url: The URL string of the corresponding HTML page
+        :param parser: name of the parser backend, one of PARSERS
+        :param bodyChars: parse in head-only mode, keeping this many
+            characters after the <head>, when the page is longer than that
+        :param truncated: whether head-only mode cut the page short
+        :param soup: Structuring the html string into a BeautifulSoup object
+        :param cache: results derived from the tree, shared between consumers
+        :return: None
+        '''
+        self.truncated = False
+        if bodyChars is not None:
+            head = headOnly(html, bodyChars)
+            self.truncated = len(head) < len(html)
+            html = head
+        self.html = html
+        self.url = url
+        self.parser = parser or DEFAULT_PARSER
+        if self.parser not in PARSERS:
+            raise ValueError('Unknown parser %s, expected one of %s' % (
+                self.parser, ', '.join(PARSERS)))
+        try:
+            self.soup = BeautifulSoup(html, self.parser)
+        except Exception as e:
+            print(e, e.args, self.url, 'Html error with BeautifulSoup')
+            if self.parser == FALLBACK_PARSER:
+                self.soup = BeautifulSoup(EMPTY, FALLBACK_PARSER)
+            else:
+                self.parser = FALLBACK_PARSER
+                try:
+                    self.soup = BeautifulSoup(html, FALLBACK_PARSER)
+                except Exception as e:
+                    print(e, e.args, 'Html error with %s' % (FALLBACK_PARSER))
+                    self.soup = BeautifulSoup(EMPTY, FALLBACK_PARSER)
+        self.cache = {}
+
+    def visibleText(self):
+        '''
+        Join the text strings of the document, skipping the contents of
+        script, style and noscript tags. The tree is left untouched so other
+        consumers of this document still see every element.
+
+        :param strings: text strings in document order
+        :param stack: nodes left to visit, next node last
+        :return: the document's visible text as a string
+        '''
+        if 'text' not in self.cache:
+            strings = []
+            stack = list(reversed(self.soup.contents))
+            while stack:
+                node = stack.pop()
+                if isinstance(node, Tag):
+                    if node.name not in self.hidden:
+                        stack.extend(reversed(node.contents))
+                elif type(node) in (NavigableString, CData):
+                    strings.append(node)
+            self.cache['text'] = ''.join(strings)
+        return self.cache['text']
+
+
+def headOnly(html, bodyChars):
+    '''
+    Cut a webpage down to its <head> and the start of its body. Parsers
+    close the tags left open at the cut.
+
+    :param html: an HTML webpage as a string
+    :param bodyChars: characters to keep after the end of the <head>, or
+        from the start when there is no </head>
+    :return: the shortened HTML string
+    '''
+    end = HEAD_END.search(html)
+    return html[:(end.end() if end else 0) + bodyChars]
+
+
+def asDocument(html, url, parser=None):
+    '''
+    Accept either raw HTML or an already parsed Document
+
+    :param html: an HTML string or a Document
+    :param url: The URL string of the corresponding HTML page
+    :param parser: parser backend used when html still needs parsing
+    :return: a Document
+    '''
+    if isinstance(html, Document):
+        return html
+    return Document(html, url, parser)
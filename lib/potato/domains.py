@@ -0,0 +1,96 @@
+'''
+Domain names of URLs without touching the network.
+
+tldextract normally fetches the public suffix list over HTTP on a cold
+start. The extractor here is built with fetching disabled, so it always
+uses the suffix list snapshot bundled with the pinned tldextract release,
+and caches nothing on disk. Extractions are memoized per hostname in a
+bounded LRU cache, since a crawl sees the same few hosts over and over,
+and the list functions take many URLs at once, extracting each distinct
+host only once.
+'''
+
+__author__ = 'Kevin Tarvin'
+import re
+from functools import lru_cache
+import tldextract
+
+CACHE_SIZE = 65536
+SCHEME = re.compile(r'^([a-z][a-z0-9+\-.]*:)?//', re.IGNORECASE)
+
+try:
+    EXTRACTOR = tldextract.TLDExtract(suffix_list_urls=None, cache_file=False)
+except TypeError:
+    # tldextract 3 and later name the cache setting cache_dir
+    EXTRACTOR = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
+
+
+def host(url):
+    '''
+    The hostname of a URL, which may lack a scheme
+
+    :param url: a URL or bare hostname in string format
+    :return: the lowercase hostname without port, credentials or a
+        trailing dot
+    '''
+    netloc = SCHEME.sub('', url.strip(), count=1)
+    for end in '/?#':
+        netloc = netloc.partition(end)[0]
+    netloc = netloc.rpartition('@')[2]
+    if netloc.startswith('['):
+        return netloc.partition(']')[0][1:].lower()
+    return netloc.partition(':')[0].rstrip('.').lower()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parts(hostname):
+    '''
+    Split a hostname on its public suffix
+
+    :param hostname: a lowercase hostname
+    :return: tldextract ExtractResult of subdomain, domain and suffix
+    '''
+    return EXTRACTOR(hostname)
+
+
+def name(url):
+    '''
+    :param url: a URL in string format
+    :return: the domain name of the URL without subdomains or suffix
+    '''
+    return parts(host(url)).domain
+
+
+def registeredDomain(url):
+    '''
+    :param url: a URL in string format
+    :return: the domain name with its public suffix, e.g. acme.co.uk
+    '''
+    return parts(host(url)).registered_domain
+
+
+def names(urls):
+    '''
+    Vectorized name
+
+    :param urls: a list of URL strings
+    :return: a list of domain names in input order
+    '''
+    return [parts(h).domain for h in map(host, urls)]
+
+
+def registeredDomains(urls):
+    '''
+    Vectorized registeredDomain
+
+    :param urls: a list of URL strings
+    :return: a list of registered domains in input order
+    '''
+    return [parts(h).registered_domain for h in map(host, urls)]
+
+
+def cacheInfo():
+    '''
+    :return: hits, misses and size of the hostname cache
+    '''
+    return parts.cache_info()
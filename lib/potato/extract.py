@@ -4,13 +4,65 @@ This will print out an example of data collected from one webpage
 '''
 
 __author__ = 'Kevin Tarvin'
-import tldextract
 from urllib.parse import urlparse
+from lib.potato import domains
 from lib.potato.onpage import PageParse
+from lib.potato.document import Document, EMPTY
 from lib.potato.lang import (
     utf8len,
-    idLanguage,
+    idLanguages,
     contentCount)
+from lib.potato.content import contentStats
+
+# Every field webpageData can return and the kind of value it holds:
+#   str, int and float scalars, strlist for lists of strings (extractors
+#   return '' when nothing is found), lang for language detections,
+#   hreflang for alternate link lists and stats for content statistics.
+#   content_stats and unique_content are only present when stats is asked
+#   for.
+FIELDS = (
+    ('url', 'str'),
+    ('title', 'str'),
+    ('title_length', 'int'),
+    ('h1', 'strlist'),
+    ('h1_length', 'int'),
+    ('metaDesc', 'str'),
+    ('metaDesc_length', 'int'),
+    ('ogDesc', 'str'),
+    ('ogDesc_length', 'int'),
+    ('twitDesc', 'str'),
+    ('twitDesc_length', 'int'),
+    ('twitName', 'str'),
+    ('htmlLang', 'str'),
+    ('canonical', 'str'),
+    ('hreflangOnPage', 'int'),
+    ('hreflangValues', 'hreflang'),
+    ('missingImgAlts', 'float'),
+    ('preresolve', 'strlist'),
+    ('preresolve_n', 'int'),
+    ('preconnect', 'strlist'),
+    ('preconnect_n', 'int'),
+    ('prefetch', 'strlist'),
+    ('prefetch_n', 'int'),
+    ('prerender', 'strlist'),
+    ('prerender_n', 'int'),
+    ('schema_syntax', 'str'),
+    ('microdata_elements', 'strlist'),
+    ('microdata_elements_n', 'int'),
+    ('jsonld_elements', 'strlist'),
+    ('jsonld_elements_n', 'int'),
+    ('provider', 'str'),
+    ('website', 'str'),
+    ('title_lang', 'lang'),
+    ('h1_lang', 'lang'),
+    ('meta_lang', 'lang'),
+    ('content_count', 'int'),
+    ('unique_content', 'int'),
+    ('content_stats', 'stats'),
+    ('page_size_in_bytes', 'int'),
+    ('domain_name', 'str'),
+    ('truncated', 'bool'),
+)
 
 
 def websiteDomain(url):
@@ -27,49 +79,72 @@ def websiteDomain(url):
 
 def name(url):
     '''
-    Extract the domain from a URL
+    Extract the domain from a URL, offline and memoized per hostname
 
     :return: a string of the URL's domain
     '''
-    return tldextract.extract(url).domain
+    return domains.name(url)
 
 
-def webpageData(html, currentUrl, provider, url):
+def webpageData(html, currentUrl, provider, url, parser=None, stats=False,
+                detector=None, size=None):
     '''
     Create a dictionary with information extracted from webpage.
 
-    :param html: html string object
+    :param html: html string object or a Document parsed from it
     :param currentUrl: the URL of the rendered HTML
     :param provider: a string label describing relationship to crawled domain
     :param url: The scope of the domain being crawled as a URL string
+    :param parser: parser backend for raw html, lxml unless set to html5lib
+    :param stats: also report content statistics and unique word counts
+    :param detector: LanguageDetector to use instead of the module default
+    :param size: bytes in the fetched response body, measured from the html
+        when not given
     :param content: A validation check on html that sets empty HTML if false
+    :param document: the page parsed once and shared by every extractor
     :param bi: business information dictionary
     :param title_lang: the iso 369-1 code desciribing the title's language
     :param h1_lang: the iso 369-1 code desciribing the h1's language
     :param meta_lang: the iso 369-1 code desciribing the meta's language
     :param content_count: An estimate of # of words within the HTML doc
+    :param content_stats: content statistics, only when stats is requested
+    :param unique_content: # of distinct words, only when stats is requested
     :param page_size_in_bytes: the size of the html doc in bytes
     :param domain_name: Domain name as string outlining scope of Crawl
+    :param truncated: whether only the head and start of the page were parsed
     :return: Dictionary with extracted information
     '''
     try:
-        if isinstance(html, str) and len(html) > 10:
-            content = html
+        if isinstance(html, Document) and len(html.html) > 10:
+            document = html
+        elif isinstance(html, str) and len(html) > 10:
+            document = Document(html, currentUrl, parser)
         else:
-            content = '<html><head></head><body></body></html>'
+            document = Document(EMPTY, currentUrl, parser)
         bi = {}
-        pageData = PageParse(content, url)
+        pageData = PageParse(document, url)
         parsed = pageData.structureData()
         homepage = websiteDomain(url)
         bi.update(parsed)
         bi.update({'provider': provider})
         bi.update({'website': homepage})
-        bi.update({'title_lang': idLanguage(bi.get('title'))})
-        bi.update({'h1_lang': idLanguage(bi.get('h1'))})
-        bi.update({'meta_lang': idLanguage(bi.get('metaDesc'))})
-        bi.update({'content_count': contentCount(content)})
-        bi.update({'page_size_in_bytes': utf8len(content)})
+        languages = idLanguages(
+            [bi.get('title'), bi.get('h1'), bi.get('metaDesc')], detector)
+        bi.update({'title_lang': languages[0]})
+        bi.update({'h1_lang': languages[1]})
+        bi.update({'meta_lang': languages[2]})
+        if stats:
+            content = contentStats(document)
+            bi.update({'content_count': content['words']})
+            bi.update({'unique_content': content['unique_words']})
+            bi.update({'content_stats': content})
+        else:
+            bi.update({'content_count': contentCount(document)})
+        if size is None:
+            size = utf8len(document.html)
+        bi.update({'page_size_in_bytes': size})
         bi.update({'domain_name': name(url)})
+        bi.update({'truncated': document.truncated})
         return bi
     except Exception as e:
         raise SystemExit(e, e.args, 'failed while parsing %s' % (url))
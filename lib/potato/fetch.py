@@ -0,0 +1,286 @@
+'''
+Fetch webpages over pooled, keep-alive connections.
+
+Fetcher is the synchronous API: one requests session per process with a
+connection pool per host, retries with backoff, compressed transfers and a
+cap on how much of a body is read. Fetches can be limited to some media
+types, in which case a body that is declared or sniffed as anything else is
+left unread. AsyncFetcher offers the same over an
+aiohttp connection pool for asyncio code, and is only available when the
+optional aiohttp package is installed.
+'''
+
+__author__ = 'Kevin Tarvin'
+import time
+import asyncio
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+from requests.compat import chardet
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+try:
+    import brotli  # noqa: F401 enables br decoding in urllib3 and aiohttp
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+USER_AGENT = 'Mozilla/5.0 (compatible; mpscanner/1.0)'
+RETRY_STATUSES = (500, 502, 503, 504)
+HTML_TYPES = ('text/html', 'application/xhtml+xml')
+
+
+def mediaType(headers):
+    '''
+    :param headers: dictionary-like response headers
+    :return: the lowercase media type of the Content-Type header, without
+        parameters, or '' when there is none
+    '''
+    return headers.get('Content-Type', '').split(';')[0].strip().lower()
+
+
+def rejection(url, status, headers, encoding, started):
+    '''
+    :param started: time the fetch started
+    :return: FetchResult of a response whose body was left unread
+    '''
+    return FetchResult(url, status, headers, b'', encoding,
+                       time.time() - started, False, rejected=True)
+
+
+class FetchResult(object):
+    '''
+    A fetched webpage
+
+    :param url: the final URL after redirects
+    :param status: the HTTP status code
+    :param headers: dictionary-like response headers
+    :param content: the body as bytes, at most the fetcher's maxBytes
+    :param encoding: declared character encoding of the body or None
+    :param elapsed: seconds the fetch took
+    :param truncated: True when the body was cut off at maxBytes
+    :param rejected: True when the body was left unread because it is not
+        one of the media types asked for
+    '''
+
+    def __init__(self, url, status, headers, content, encoding, elapsed,
+                 truncated, rejected=False):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        self.elapsed = elapsed
+        self.truncated = truncated
+        self.rejected = rejected
+
+    @property
+    def contentType(self):
+        '''
+        :return: the media type the server declared for the body
+        '''
+        return mediaType(self.headers)
+
+    @property
+    def text(self):
+        '''
+        :return: the body decoded with its declared or detected encoding,
+            or as utf-8 when that encoding is unknown
+        '''
+        encoding = self.encoding or chardet.detect(self.content)['encoding']
+        try:
+            return str(self.content, encoding or 'utf-8', errors='replace')
+        except LookupError:
+            return str(self.content, 'utf-8', errors='replace')
+
+
+class Fetcher(object):
+    '''
+    Synchronous fetches through a shared, pooled requests session
+
+    :param timeout: seconds to wait to connect and between bytes
+    :param retries: times to retry connection errors and 5xx responses
+    :param maxBytes: the most bytes of a body to read
+    :param perHost: the most connections open per host, further requests
+        to the host wait for one of them to be released
+    :param chunkSize: bytes read from the network at a time
+    '''
+
+    def __init__(self, timeout=5, retries=2, maxBytes=5 * 1024 * 1024,
+                 perHost=4, chunkSize=65536):
+        self.timeout = timeout
+        self.maxBytes = maxBytes
+        self.chunkSize = chunkSize
+        retry = Retry(total=retries, backoff_factor=0.5,
+                      status_forcelist=RETRY_STATUSES, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=perHost,
+                              pool_block=True, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'User-Agent': USER_AGENT,
+                                     'Accept-Encoding': ACCEPT_ENCODING})
+
+    def open(self, url, headers=None):
+        '''
+        Start a streamed request, leaving the body unread. Close the
+        response once done with it.
+
+        :param url: a URL in string format
+        :param headers: extra request headers
+        :return: requests response opened with stream=True
+        '''
+        return self.session.get(url, headers=headers, timeout=self.timeout,
+                                stream=True)
+
+    def fetch(self, url, headers=None, types=None):
+        '''
+        Fetch a URL, reading the body in chunks up to maxBytes. When types
+        is given, a body declared as another media type is not read, nor is
+        one whose first chunk holds NUL bytes, a sign of a binary file.
+
+        :param url: a URL in string format
+        :param headers: extra request headers
+        :param types: media types to read the body of, such as HTML_TYPES
+        :param chunks: pieces of the body read so far
+        :param size: bytes read so far
+        :return: FetchResult
+        '''
+        started = time.time()
+        r = self.open(url, headers)
+        try:
+            declared = mediaType(r.headers)
+            if types and declared and declared not in types:
+                return rejection(r.url, r.status_code, r.headers,
+                                 r.encoding, started)
+            chunks = []
+            size = 0
+            truncated = False
+            for chunk in r.iter_content(self.chunkSize):
+                if types and not chunks and b'\x00' in chunk:
+                    return rejection(r.url, r.status_code, r.headers,
+                                     r.encoding, started)
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= self.maxBytes:
+                    truncated = True
+                    break
+            content = b''.join(chunks)[:self.maxBytes]
+        finally:
+            r.close()
+        return FetchResult(r.url, r.status_code, r.headers, content,
+                           r.encoding, time.time() - started, truncated)
+
+
+class AsyncFetcher(object):
+    '''
+    Asynchronous fetches through an aiohttp connection pool. Use it as an
+    async context manager so the pool is closed afterwards.
+
+    :param timeout: seconds a whole fetch may take
+    :param retries: times to retry connection errors and 5xx responses
+    :param maxBytes: the most bytes of a body to read
+    :param limit: the most connections open in total
+    :param perHost: the most connections open per host
+    :param chunkSize: bytes read from the network at a time
+    '''
+
+    def __init__(self, timeout=5, retries=2, maxBytes=5 * 1024 * 1024,
+                 limit=100, perHost=4, chunkSize=65536):
+        if aiohttp is None:
+            raise RuntimeError('AsyncFetcher requires aiohttp to be installed')
+        self.timeout = timeout
+        self.retries = retries
+        self.maxBytes = maxBytes
+        self.limit = limit
+        self.perHost = perHost
+        self.chunkSize = chunkSize
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.limit,
+                                         limit_per_host=self.perHost)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={'User-Agent': USER_AGENT,
+                     'Accept-Encoding': ACCEPT_ENCODING})
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def fetch(self, url, headers=None, types=None):
+        '''
+        Fetch a URL, reading the body in chunks up to maxBytes and retrying
+        with backoff on connection errors and 5xx responses. Bodies of other
+        media types than types are left unread, as with Fetcher.fetch.
+
+        :param url: a URL in string format
+        :param headers: extra request headers
+        :param types: media types to read the body of, such as HTML_TYPES
+        :return: FetchResult
+        '''
+        attempt = 0
+        while True:
+            started = time.time()
+            try:
+                async with self.session.get(url, headers=headers) as r:
+                    if r.status in RETRY_STATUSES and attempt < self.retries:
+                        raise aiohttp.ClientResponseError(
+                            r.request_info, r.history, status=r.status)
+                    declared = mediaType(r.headers)
+                    if types and declared and declared not in types:
+                        return rejection(str(r.url), r.status, r.headers,
+                                         r.charset, started)
+                    chunks = []
+                    size = 0
+                    truncated = False
+                    async for chunk in r.content.iter_chunked(self.chunkSize):
+                        if types and not chunks and b'\x00' in chunk:
+                            return rejection(str(r.url), r.status,
+                                             r.headers, r.charset, started)
+                        chunks.append(chunk)
+                        size += len(chunk)
+                        if size >= self.maxBytes:
+                            truncated = True
+                            break
+                    content = b''.join(chunks)[:self.maxBytes]
+                    return FetchResult(str(r.url), r.status, r.headers,
+                                       content, r.charset,
+                                       time.time() - started, truncated)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt >= self.retries:
+                    raise
+                await asyncio.sleep(0.5 * (2 ** attempt))
+                attempt += 1
+
+    async def fetchAll(self, urls, headers=None, types=None):
+        '''
+        Fetch many URLs concurrently within the pool's limits
+
+        :param urls: a list of URL strings
+        :param headers: extra request headers
+        :param types: media types to read the body of
+        :return: list of FetchResult or the exception raised, in input order
+        '''
+        return await asyncio.gather(
+            *[self.fetch(url, headers, types) for url in urls],
+            return_exceptions=True)
+
+
+def fetchAll(urls, types=None, **kwargs):
+    '''
+    Fetch many URLs concurrently from synchronous code
+
+    :param urls: a list of URL strings
+    :param types: media types to read the body of
+    :param kwargs: AsyncFetcher settings
+    :return: list of FetchResult or the exception raised, in input order
+    '''
+    async def run():
+        async with AsyncFetcher(**kwargs) as fetcher:
+            return await fetcher.fetchAll(urls, types=types)
+    return asyncio.get_event_loop().run_until_complete(run())
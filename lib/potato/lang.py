@@ -1,98 +1,267 @@
 '''
 Identify language of a given text string.
+
+Detection goes through a LanguageDetector, which keeps a bounded LRU cache
+keyed on whitespace-normalized text. Boilerplate titles and descriptions
+repeat across a site, so most lookups during a crawl never reach the
+detector backend. Backends are seeded so the same text always gets the same
+answer.
 '''
 
 __author__ = 'Kevin Tarvin'
-from bs4 import BeautifulSoup
-from langdetect import detect_langs
+from collections import Counter, OrderedDict
+from threading import Lock
+from lib.potato.document import asDocument
+
+EMPTY_RESULT = {'language': '', 'confidence': ''}
 
 
-def idLanguage(text):
+def langdetectBackend(seed):
     '''
-    Detect language and provide a confidence level
+    Detect languages with langdetect, seeded so results are deterministic
+
+    :param seed: seed for langdetect's random sampling
+    :return: function taking text and returning (language, probability)
+    '''
+    from langdetect import DetectorFactory, detect_langs
+    DetectorFactory.seed = seed
+
+    def detect(text):
+        best = detect_langs(text)[0]
+        return best.lang, best.prob
+    return detect
+
+
+def langidBackend(seed):
+    '''
+    Detect languages with langid.py, a faster n-gram classifier. langid is
+    deterministic so the seed is unused. It is an optional dependency.
+
+    :param seed: unused, accepted to match the other backends
+    :return: function taking text and returning (language, probability)
+    '''
+    from langid.langid import LanguageIdentifier, model
+    identifier = LanguageIdentifier.from_modelstring(model, norm_probs=True)
+
+    def detect(text):
+        return identifier.classify(text)
+    return detect
+
+
+BACKENDS = {'langdetect': langdetectBackend, 'langid': langidBackend}
+
+
+class LanguageDetector(object):
+    '''
+    Cached, batched language detection over a pluggable backend
+
+    :param backend: name of the detection backend, one of BACKENDS
+    :param size: the most results to keep in the LRU cache
+    :param seed: seed handed to the backend for deterministic results
+    '''
+
+    def __init__(self, backend='langdetect', size=10000, seed=0):
+        if backend not in BACKENDS:
+            raise ValueError('Unknown language backend %s, expected one of '
+                             '%s' % (backend, ', '.join(sorted(BACKENDS))))
+        self.backend = backend
+        self.size = size
+        self.detect = BACKENDS[backend](seed)
+        self.cache = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text):
+        '''
+        :param text: a string of text
+        :return: the text with runs of whitespace collapsed to single spaces
+        '''
+        return ' '.join(text.split())
+
+    def lookup(self, key):
+        '''
+        :param key: normalized text
+        :return: a copy of the cached result or None
+        '''
+        with self.lock:
+            result = self.cache.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def store(self, key, result):
+        '''
+        Cache a result, evicting the least recently used beyond size
+
+        :param key: normalized text
+        :param result: language detection dictionary
+        :return: None
+        '''
+        with self.lock:
+            self.cache[key] = result
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.size:
+                self.cache.popitem(last=False)
+
+    def detectMany(self, texts):
+        '''
+        Detect the language of many strings in one call. Duplicates and
+        cached strings are only sent to the backend once.
+
+        :param texts: a list of strings
+        :param keys: normalized form of each string
+        :param found: results by normalized text for this batch
+        :return: list of language detection dictionaries in input order
+        '''
+        keys = [self.normalize(text) for text in texts]
+        found = {}
+        for key in keys:
+            if key in found:
+                continue
+            result = self.lookup(key)
+            if result is None:
+                try:
+                    language, probability = self.detect(key)
+                    result = {'language': language,
+                              'confidence': str(probability)}
+                except Exception as e:
+                    # Print exceptions to identify point of failure
+                    print(e, e.args, 'failed during language detection of '
+                          'the following: %s' % (key))
+                    result = dict(EMPTY_RESULT)
+                self.store(key, result)
+            found[key] = result
+        return [dict(found[key]) for key in keys]
+
+
+detector = None
+
 
+def defaultDetector():
+    '''
+    :return: the module's LanguageDetector, built on first use
+    '''
+    global detector
+    if detector is None:
+        detector = LanguageDetector()
+    return detector
+
+
+def checkableText(text):
+    '''
+    Pick the string worth running detection on
+
+    :param text: a string, or a list whose first item is checked
     :param stringToCheck: a string of text to identify
-    :param results: detect_langs response as string
-    :param formattedResults: string sliced into list
+    :return: the string to check, or None when detection should be skipped
+    '''
+    # Handle text arg types
+    if isinstance(text, list):
+        stringToCheck = text[0] if text else None
+    elif isinstance(text, str):
+        stringToCheck = text
+    else:
+        return None
+    # Type validation check
+    if not isinstance(stringToCheck, str):
+        # Identify dType which failed validation
+        print('Detection Result Error: a %s object made it through' % (
+                type(stringToCheck)))
+        print('data object: %s came from: %s' % (stringToCheck, text))
+        return None
+    # Short strings lower detection accuracy
+    if len(stringToCheck) < 10:
+        return None
+    return stringToCheck
+
+
+def idLanguages(texts, detector=None):
+    '''
+    Detect the language of several values with one batched detector call
+
+    :param texts: a list of strings, lists of strings or other values
+    :param detector: LanguageDetector to use instead of the module default
+    :param checks: the string worth checking for each value, or None
+    :param results: detections for the values that were checked
+    :return: list of language detection dictionaries in input order
+    '''
+    detector = detector or defaultDetector()
+    checks = [checkableText(text) for text in texts]
+    results = iter(detector.detectMany([c for c in checks if c is not None]))
+    return [next(results) if c is not None else dict(EMPTY_RESULT)
+            for c in checks]
+
+
+def idLanguage(text, detector=None):
+    '''
+    Detect language and provide a confidence level
+
+    :param text: a string, or a list whose first item is checked
+    :param detector: LanguageDetector to use instead of the module default
     :param language: iso639-1 value of detected language
     :param confidence: percentage confidence in detection as string
     :return: a dictionary containing language detection values
     '''
-    # Handle text arg types
-    try:
-        if isinstance(text, list):
-            stringToCheck = text[0]
-        elif isinstance(text, str):
-            stringToCheck = text
-        else:
-            return {'language': '', 'confidence': ''}
-        # Type validation check
-        if isinstance(stringToCheck, str):
-            # Short strings lower detection accuracy
-            if len(stringToCheck) < 10:
-                return {'language': '', 'confidence': ''}
-            else:
-                results = detect_langs(stringToCheck)
-                formattedResults = str(results[0]).split(':')
-                language = formattedResults[0]
-                confidence = formattedResults[1]
-                return {'language': language, 'confidence': confidence}
-        else:
-            # Identify dType which failed validation
-            print('Detection Result Error: a %s object made it through' % (
-                    type(results)))
-            print('data object: %s came from: %s' % (results, text))
-            return {'language': '', 'confidence': ''}
-    except Exception as e:
-        # Print exceptions to identify point of failure
-        print(e, e.args,
-              'failed during language detection of the following: %s' % (text))
-        return {'language': '', 'confidence': ''}
-
-
-def contentCount(html):
+    return idLanguages([text], detector)[0]
+
+
+def pageText(html, parser=None):
     '''
-    Get a count of words within the webpage
+    The visible text of a webpage with whitespace collapsed. The result is
+    cached on the Document so word counts and content statistics share it.
 
-    :param html: HTML of webpage as string
-    :param soup: structured HTML into BeautifulSoup object
-    :param text: text strings within soup object
+    :param html: HTML of webpage as string or a parsed Document
+    :param parser: parser backend used when html is still a string
+    :param document: the parsed webpage
+    :param text: visible text strings within the document
     :param lines: trim whitespace from text
     :param chunks: break up multi-headlines into strings
-    :param text: join text into a long string
+    :return: the page's text joined into a long string
+    '''
+    document = asDocument(html, None, parser)
+    if 'pageText' not in document.cache:
+        # script, style and noscript text is skipped without mutating the tree
+        text = document.visibleText()
+        # break into lines and remove leading and trailing space on each
+        lines = (line.strip() for line in text.splitlines())
+        # break multi-headlines into a line each
+        chunks = (phrase.strip() for line in lines
+                  for phrase in line.split("  "))
+        # drop blank lines
+        document.cache['pageText'] = ' '.join(
+            chunk for chunk in chunks if chunk)
+    return document.cache['pageText']
+
+
+def contentCount(html, parser=None):
+    '''
+    Get a count of words within the webpage
+
+    :param html: HTML of webpage as string or a parsed Document
+    :param parser: parser backend used when html is still a string
+    :param text: visible text of the webpage as one string
     :param w: a dictionary of words and their frequency
     :return: integer sum of content in webpage
     '''
-    soup = BeautifulSoup(html, 'html5lib')
-    # kill all script and style elements
-    for script in soup(["script", "style", "noscript"]):
-        script.extract()    # rip it out
-    # get text
-    text = soup.get_text()
-    # break into lines and remove leading and trailing space on each
-    lines = (line.strip() for line in text.splitlines())
-    # break multi-headlines into a line each
-    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-    # drop blank lines
-    text = ' '.join(chunk for chunk in chunks if chunk)
+    text = pageText(html, parser)
     w = word_count(text)
-    # uniqueContent = len(w.keys())
     return sum(w.values())
 
 
 def word_count(string):
     '''
-    A dictionary with the frequency of content
+    A dictionary with the frequency of content, built in a single pass
 
     :param strings: strings sliced into words
-    :param content: Dictionary of words as keys and frequency as values
-    :return: A dictionary of words and their frequencies
+    :return: A Counter of words and their frequencies
     '''
     strings = string.lower().split()
-    content = {}
-    for item in strings:
-        content[item] = strings.count(item)
-    return content
+    return Counter(strings)
 
 
 def utf8len(text):
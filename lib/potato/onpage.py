@@ -3,34 +3,130 @@ and returns structured responses
 '''
 
 __author__ = 'Kevin Tarvin'
-from bs4 import BeautifulSoup
 import json
+from urllib.parse import urljoin
+from lib.potato.document import asDocument
 
 
-class PageParse(object):
+def hasAttr(attr):
     '''
-    Take a webpage's HTML and extract information from it
+    Build a matcher for tags which declare an attribute, whatever its value
+
+    :param attr: name of the attribute to look for
+    :return: function taking a tag and returning a boolean
     '''
+    return lambda tag: tag.get(attr) is not None
 
-    def __init__(self, html, url):
-        '''
-        Pass the webpage's HTML as a string which is then turned into a
-        BeautifulSoup object
 
-        :param html: an HTML webpage as a string
+def attrEquals(attr, value):
+    '''
+    Build a matcher for tags whose attribute equals a value. Multi-valued
+    attributes such as rel match on any single value or on the joined string,
+    the same way BeautifulSoup's find does.
+
+    :param attr: name of the attribute to compare
+    :param value: the string the attribute value must equal
+    :return: function taking a tag and returning a boolean
+    '''
+    def match(tag):
+        found = tag.get(attr)
+        if isinstance(found, (list, tuple)):
+            return value in found or ' '.join(found) == value
+        return found == value
+    return match
+
+
+class PageParse(object):
+    '''
+    Take a webpage's HTML and extract information from it
+
+    :param extractors: (key, tag name, matcher) triples. The document is walked
+        once and every tag is handed to the extractors registered for its name
+        (or for any name when the tag name is None). Tags that match are
+        collected under key, in document order.
+    '''
+    extractors = (
+        ('title', 'title', None),
+        ('h1', 'h1', None),
+        ('href', 'a', hasAttr('href')),
+        ('img', 'img', None),
+        ('lang', 'html', hasAttr('lang')),
+        ('xml:lang', 'html', hasAttr('xml:lang')),
+        ('og:Description', 'meta', attrEquals('property', 'og:Description')),
+        ('og:description', 'meta', attrEquals('property', 'og:description')),
+        ('canonical', 'link', attrEquals('rel', 'canonical')),
+        ('hreflang', 'link', hasAttr('hreflang')),
+        ('dns-prefetch', 'link', attrEquals('rel', 'dns-prefetch')),
+        ('preconnect', 'link', attrEquals('rel', 'preconnect')),
+        ('prefetch', 'link', attrEquals('rel', 'prefetch')),
+        ('prerender', 'link', attrEquals('rel', 'prerender')),
+        ('Description', None, attrEquals('name', 'Description')),
+        ('description', None, attrEquals('name', 'description')),
+        ('twitter:description', None,
+         attrEquals('name', 'twitter:description')),
+        ('Twitter:site', None, attrEquals('name', 'Twitter:site')),
+        ('twitter:site', None, attrEquals('name', 'twitter:site')),
+        ('itemprop', None, hasAttr('itemprop')),
+        ('itemscope', None, hasAttr('itemscope')),
+        ('ld+json', None, attrEquals('type', 'application/ld+json')),
+        ('base', 'base', hasAttr('href')),
+    )
+
+    def __init__(self, html, url, parser=None):
+        '''
+        Pass the webpage's HTML as a string, or a Document that has already
+        been parsed, which is then used as a BeautifulSoup object
+
+        :param html: an HTML webpage as a string or a parsed Document
         :param url: The URL string of the corresponding HTML page
+        :param parser: parser backend used when html is still a string
+        :param document: the parsed webpage shared with other extractors
         :param soup: Structuring the html string into a BeautifulSoup object
-        :param empty: an Empty HTML string
         :return: None
         '''
-        self.html = html
+        self.document = asDocument(html, url, parser)
+        self.html = self.document.html
         self.url = url
-        try:
-            self.soup = BeautifulSoup(html, 'html5lib')
-        except Exception as e:
-            print(e, e.args, self.html, 'Html error with BeautifulSoup')
-            empty = '<html><head></head><body></body></html>'
-            self.soup = BeautifulSoup(empty, 'html5lib')
+        self.soup = self.document.soup
+
+    def collect(self):
+        '''
+        Walk the document a single time and gather the tags each registered
+        extractor asks for. The result is cached on the Document so every
+        method on this class, and every PageParse sharing the Document, reuses
+        the one traversal.
+
+        :param byName: extractors grouped by the tag name they care about
+        :param anyName: extractors which inspect tags of every name
+        :return: dictionary of extractor key to list of matching tags
+        '''
+        if 'tags' in self.document.cache:
+            return self.document.cache['tags']
+        collected = {key: [] for key, name, match in self.extractors}
+        byName = {}
+        anyName = []
+        for key, name, match in self.extractors:
+            if name is None:
+                anyName.append((key, match))
+            else:
+                byName.setdefault(name, []).append((key, match))
+        for tag in self.soup.find_all(True):
+            for key, match in byName.get(tag.name, ()):
+                if match is None or match(tag):
+                    collected[key].append(tag)
+            for key, match in anyName:
+                if match(tag):
+                    collected[key].append(tag)
+        self.document.cache['tags'] = collected
+        return collected
+
+    def first(self, key):
+        '''
+        :param key: an extractor key
+        :return: the first tag collected under key or None
+        '''
+        tags = self.collect()[key]
+        return tags[0] if tags else None
 
     def hrefs(self):
         '''
@@ -38,10 +134,22 @@ class PageParse(object):
         :param hrefs: a list of hrefs from the anchor tags in linkData
         :return: list of hrefs from the webpage
         '''
-        linkData = self.soup.find_all('a', href=True)
+        linkData = self.collect()['href']
         hrefs = [a['href'] for a in linkData]
         return hrefs
 
+    def baseUrl(self):
+        '''
+        The URL relative links on the page resolve against: the first
+        <base href>, itself resolved against the page URL, or the page URL
+
+        :return: URL string
+        '''
+        base = self.first('base')
+        if base is None:
+            return self.url
+        return urljoin(self.url, base['href'].strip())
+
     def title(self):
         '''
         Extract the Title text from a webpage
@@ -49,7 +157,8 @@ class PageParse(object):
         :return: the text string extracted from HTML <title> tags
         '''
         try:
-            return self.soup.title.text if self.soup.title else ''
+            titles = self.collect()['title']
+            return titles[0].text if titles else ''
         except Exception as e:
             print(e, e.args, 'title')
 
@@ -62,7 +171,7 @@ class PageParse(object):
         :return: the text string extracted from HTML <h1> tags
         '''
         try:
-            h1s = self.soup.find_all('h1')
+            h1s = self.collect()['h1']
             h1 = [x.text for x in h1s]
             return h1 if h1s else ''
         except Exception as e:
@@ -76,9 +185,9 @@ class PageParse(object):
         :return: Text string extracted from HTML <meta> tags or empty string
         '''
         try:
-            desc = self.soup.find(attrs={'name': 'Description'})
+            desc = self.first('Description')
             if desc is None:
-                    desc = self.soup.find(attrs={'name': 'description'})
+                    desc = self.first('description')
             return desc.get('content', '') if desc else ''
         except Exception as e:
             print(e, e.args, 'metaDesc')
@@ -91,9 +200,9 @@ class PageParse(object):
         :return: the text string extracted from HTML <meta> tags
         '''
         try:
-            fbDesc = self.soup.find('meta',  property='og:Description')
+            fbDesc = self.first('og:Description')
             if fbDesc is None:
-                    fbDesc = self.soup.find('meta',  property='og:description')
+                    fbDesc = self.first('og:description')
             # return fbDesc['content'] if fbDesc else ''
             return fbDesc.get('content', '') if fbDesc else ''
         except Exception as e:
@@ -107,9 +216,7 @@ class PageParse(object):
         :return: Text string extracted from HTML <meta> tags or empty string
         '''
         try:
-            tMeta = self.soup.find(attrs={'name': 'twitter:description'})
-            if tMeta is None:
-                tMeta = self.soup.find(attrs={'name': 'twitter:description'})
+            tMeta = self.first('twitter:description')
             # return tMeta['content'] if tMeta else ''
             return tMeta.get('content', '') if tMeta else ''
         except Exception as e:
@@ -123,9 +230,9 @@ class PageParse(object):
         :return: Twitter username string extracted from HTML
         '''
         try:
-            twittername = self.soup.find(attrs={'name': 'Twitter:site'})
+            twittername = self.first('Twitter:site')
             if twittername is None:
-                twittername = self.soup.find(attrs={'name': 'twitter:site'})
+                twittername = self.first('twitter:site')
             try:
                 # return twittername['content'] if twittername else ''
                 return twittername.get('content', '') if twittername else ''
@@ -144,11 +251,11 @@ class PageParse(object):
         :return: string value of html language for a webpage
         '''
         try:
-            language = self.soup.find('html', attrs={'lang': True})
+            language = self.first('lang')
             # return language['lang'] if language else ''
             l = language.get('lang', '') if language else ''
             if len(l) == 0:
-                xmllang = self.soup.find('html', attrs={'xml:lang': True})
+                xmllang = self.first('xml:lang')
                 return xmllang.get('xml:lang', '') if xmllang else ''
             else:
                 return language.get('lang', '') if language else ''
@@ -163,7 +270,7 @@ class PageParse(object):
         :return: href extracted from the canonical link
         '''
         try:
-            canon = self.soup.find('link', rel='canonical')
+            canon = self.first('canonical')
             # return canon['href'] if canon else ''
             return canon.get('href', '') if canon else ''
         except Exception as e:
@@ -177,7 +284,7 @@ class PageParse(object):
         :return: Integer representing the quantity of hreflang tags on page
         '''
         try:
-            hreflang = self.soup.find_all('link', hreflang=True)
+            hreflang = self.collect()['hreflang']
             return len(hreflang) if hreflang else 0
         except Exception as e:
             print(e, e.args, 'hreflangOnPage')
@@ -192,7 +299,7 @@ class PageParse(object):
         :return: List of dictionaries containing alternate versions of webpage
         '''
         try:
-            href = self.soup.find_all('link', hreflang=True)
+            href = self.collect()['hreflang']
             altSites = []
             for link in href:
                 alt = {'hreflang': link['hreflang'], 'loc': link['href']}
@@ -212,8 +319,8 @@ class PageParse(object):
         :return: Float representing percentage of SEO img tags
         '''
         try:
-            img = self.soup.find_all('img')
-            alts = self.soup.find_all('img', alt=True)
+            img = self.collect()['img']
+            alts = [x for x in img if x.get('alt') is not None]
             hasAlts = [x['alt'] for x in alts if len(x['alt']) > 4]
             return (1 - (len(hasAlts)/len(img))) if len(img) > 0 else 0
         except Exception as e:
@@ -228,7 +335,7 @@ class PageParse(object):
         :return: list of preresolved resources
         '''
         try:
-            preresolved = self.soup.find_all('link', rel='dns-prefetch')
+            preresolved = self.collect()['dns-prefetch']
             resources = [x['href'] for x in preresolved]
             return resources if preresolved else ''
         except Exception as e:
@@ -243,7 +350,7 @@ class PageParse(object):
         :return: list of preconnected resources
         '''
         try:
-            preconnected = self.soup.find_all('link', rel='preconnect')
+            preconnected = self.collect()['preconnect']
             resources = [x['href'] for x in preconnected]
             return resources if preconnected else ''
         except Exception as e:
@@ -258,7 +365,7 @@ class PageParse(object):
         :return: list of prefetched resources
         '''
         try:
-            prefetched = self.soup.find_all('link', rel='prefetch')
+            prefetched = self.collect()['prefetch']
             resources = [x['href'] for x in prefetched]
             return resources if prefetched else ''
         except Exception as e:
@@ -273,7 +380,7 @@ class PageParse(object):
         :return: list of prerendered resources
         '''
         try:
-            prerendered = self.soup.find_all('link', rel='prerender')
+            prerendered = self.collect()['prerender']
             resources = [x['href'] for x in prerendered]
             return resources if prerendered else ''
         except Exception as e:
@@ -288,7 +395,7 @@ class PageParse(object):
         :return: list of microdata elements found on page
         '''
         try:
-            itemprops = self.soup.find_all(itemprop=True)
+            itemprops = self.collect()['itemprop']
             return [x['itemprop'] for x in itemprops]
         except Exception as e:
             print(e, e.args, 'microdataAttrs')
@@ -301,7 +408,7 @@ class PageParse(object):
         :return: list of itemtype values within on page microdata
         '''
         try:
-            schema = self.soup.find_all(itemscope=True)
+            schema = self.collect()['itemscope']
             return [x['itemtype'] for x in schema]
         except Exception as e:
             print(e, e.args, 'microdataType')
@@ -317,9 +424,9 @@ class PageParse(object):
         :return: string description of implemented schema
         '''
         try:
-            microdata = self.soup.find_all(itemprop=True)
+            microdata = self.collect()['itemprop']
             isMicro = [x['itemprop'] for x in microdata]
-            jsonld = self.soup.find_all(attrs={'type': 'application/ld+json'})
+            jsonld = self.collect()['ld+json']
             if len(isMicro) >= 1:
                 return 'Microdata'
             elif len(jsonld) >= 1:
@@ -341,8 +448,9 @@ class PageParse(object):
         '''
         try:
             data = []
-            jsonld = self.soup.find_all(attrs={'type': 'application/ld+json'})
-            jsonldelements = [x.text for x in jsonld]
+            jsonld = self.collect()['ld+json']
+            # .string keeps script text on builders that type it as Script
+            jsonldelements = [x.string or '' for x in jsonld]
             # Enemeration for multiple scripts tags on page
             for element in jsonldelements:
                 # Type validation to determine if multiple elements present
@@ -362,40 +470,52 @@ class PageParse(object):
     def structureData(self):
         '''
         A method which outputs a dictionary of values extracted through methods
-        contained in this class
+        contained in this class. Every method reads from the same single pass
+        over the document, and each is called once.
 
         :param data: Extracted information structured into a dictionary
         :return: A dictionary of parsed results
         '''
+        title = self.title()
+        h1 = self.h1()
+        metaDesc = self.metaDesc()
+        ogDesc = self.ogDesc()
+        twitDesc = self.twitDesc()
+        preresolve = self.preresolve()
+        preconnect = self.preconnect()
+        prefetch = self.prefetch()
+        prerender = self.prerender()
+        microdata = self.microdataType()
+        jsonld = self.jsonld()
         data = {'url': self.url,
-                'title': self.title(),
-                'title_length': len(self.title()),
-                'h1': self.h1(),
-                'h1_length': len(self.h1()),
-                'metaDesc': self.metaDesc(),
-                'metaDesc_length': len(self.metaDesc()),
-                'ogDesc': self.ogDesc(),
-                'ogDesc_length': len(self.ogDesc()),
-                'twitDesc': self.twitDesc(),
-                'twitDesc_length': len(self.twitDesc()),
+                'title': title,
+                'title_length': len(title),
+                'h1': h1,
+                'h1_length': len(h1),
+                'metaDesc': metaDesc,
+                'metaDesc_length': len(metaDesc),
+                'ogDesc': ogDesc,
+                'ogDesc_length': len(ogDesc),
+                'twitDesc': twitDesc,
+                'twitDesc_length': len(twitDesc),
                 'twitName': self.twitName(),
                 'htmlLang': self.htmlLang(),
                 'canonical': self.canoncial(),
                 'hreflangOnPage': self.hreflangOnPage(),
                 'hreflangValues': self.hreflangValues(),
                 'missingImgAlts': self.missingImgAlt(),
-                'preresolve': self.preresolve(),
-                'preresolve_n': len(self.preresolve()),
-                'preconnect': self.preconnect(),
-                'preconnect_n': len(self.preconnect()),
-                'prefetch': self.prefetch(),
-                'prefetch_n': len(self.prefetch()),
-                'prerender': self.prerender(),
-                'prerender_n': len(self.prerender()),
+                'preresolve': preresolve,
+                'preresolve_n': len(preresolve),
+                'preconnect': preconnect,
+                'preconnect_n': len(preconnect),
+                'prefetch': prefetch,
+                'prefetch_n': len(prefetch),
+                'prerender': prerender,
+                'prerender_n': len(prerender),
                 'schema_syntax': self.schemaSyntax(),
-                'microdata_elements': self.microdataType(),
-                'microdata_elements_n': len(self.microdataType()),
-                'jsonld_elements': self.jsonld(),
-                'jsonld_elements_n': len(self.jsonld())
+                'microdata_elements': microdata,
+                'microdata_elements_n': len(microdata),
+                'jsonld_elements': jsonld,
+                'jsonld_elements_n': len(jsonld)
                 }
         return data
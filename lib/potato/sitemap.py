@@ -6,58 +6,315 @@ sitemap. Sitemaps are discovered by following best practices for xml sitemap
 declaration. The robots.txt is checked first. If a sitemap isn't declared,
 several guesses are made using the most common xml sitemap naming conventions.
 
+Sitemap bodies are streamed through lxml's iterparse, gunzipping .xml.gz
+sitemaps on the fly and clearing each element once read, so memory stays
+flat however large a sitemap is. parseSitemap and sitemapEntries expose the
+stream as a generator of loc/lastmod entries.
+
+Sitemaps are fetched concurrently through a SitemapWalker: a bounded thread
+pool sharing one pooled potato Fetcher, with a cap on how many requests
+are in flight against any single host. Sitemap indexes are expanded breadth
+first, one level at a time. A sitemap that fails to fetch or parse is
+recorded with its error and the walk carries on with the others.
+
 sample usage:
 $python sitemap.py 'https://www.exmaple.com/'
 '''
 
 __author__ = 'Kevin Tarvin'
 import sys
+import gzip
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree
 from reppy.robots import Robots
 from urllib.parse import urlparse
+from lib.potato.fetch import Fetcher
+
+GZIP_MAGIC = b'\x1f\x8b'
+ENTRIES = ('url', 'sitemap')
+
+
+def localName(tag):
+    '''
+    :param tag: an lxml element tag, possibly namespaced
+    :return: the tag name without its namespace, or '' for comments
+    '''
+    if not isinstance(tag, str):
+        return ''
+    return tag.rsplit('}', 1)[-1]
+
+
+class ChunkReader(object):
+    '''
+    A minimal file-like object over an iterator of byte chunks, holding at
+    most one chunk in memory
+
+    :param chunks: iterator of bytes
+    :param buffer: bytes read from chunks but not yet returned
+    '''
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b''
+
+    def peek(self, size):
+        '''
+        :param size: number of bytes wanted
+        :return: up to size bytes from the front of the stream, unconsumed
+        '''
+        while len(self.buffer) < size:
+            chunk = next(self.chunks, b'')
+            if not chunk:
+                break
+            self.buffer += chunk
+        return self.buffer[:size]
+
+    def read(self, size=-1):
+        '''
+        :param size: the most bytes to return, everything left if negative
+        :return: bytes, empty once the stream is exhausted
+        '''
+        if size is None or size < 0:
+            data = self.buffer + b''.join(self.chunks)
+            self.buffer = b''
+            return data
+        if not self.buffer:
+            self.buffer = next(self.chunks, b'')
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
 
 
-def findSitemap(url):
+def responseStream(r, chunkSize=65536):
+    '''
+    Wrap a streamed response body in a file-like object, decoding any
+    Content-Encoding and gunzipping bodies that are gzip files themselves,
+    as .xml.gz sitemaps are.
+
+    :param r: requests response opened with stream=True
+    :param chunkSize: bytes read from the network at a time
+    :param stream: file-like reader over the decoded response
+    :return: file-like object of the sitemap's XML
+    '''
+    stream = ChunkReader(r.iter_content(chunkSize))
+    if stream.peek(2) == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def parseSitemap(stream):
+    '''
+    Incrementally parse a sitemap or sitemap index. Each url or sitemap
+    element is cleared once read, and its finished siblings dropped, so only
+    one entry is held in memory at a time.
+
+    :param stream: file-like object of sitemap XML
+    :param entry: dictionary describing a url or sitemap element
+    :return: generator of dictionaries with kind ('url' or 'sitemap'), loc
+        and lastmod
+    '''
+    for event, elem in etree.iterparse(stream, events=('end',),
+                                       recover=True, huge_tree=True):
+        kind = localName(elem.tag)
+        if kind not in ENTRIES:
+            continue
+        entry = {'kind': kind, 'loc': '', 'lastmod': ''}
+        for child in elem:
+            field = localName(child.tag)
+            if field in ('loc', 'lastmod'):
+                entry[field] = (child.text or '').strip()
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+        if entry['loc']:
+            yield entry
+
+
+def sitemapEntries(sitemap, fetcher=None):
+    '''
+    Stream the entries of a sitemap location as they are downloaded
+
+    :param sitemap: xml sitemap location as a URL string
+    :param fetcher: the pooled Fetcher to request with
+    :return: generator of dictionaries with kind, loc and lastmod, raising
+        requests.HTTPError for a response other than 200 OK
+    '''
+    fetcher = fetcher or Fetcher(timeout=10)
+    r = fetcher.open(sitemap)
+    try:
+        if r.status_code != 200:
+            raise requests.HTTPError('%s answered %d' % (sitemap,
+                                                         r.status_code),
+                                     response=r)
+        for entry in parseSitemap(responseStream(r)):
+            yield entry
+    finally:
+        r.close()
+
+
+class SitemapWalker(object):
+    '''
+    Fetch sitemaps concurrently with a shared, pooled Fetcher
+
+    :param workers: size of the thread pool fetching sitemaps
+    :param perHost: the most requests in flight against one host
+    :param timeout: seconds to wait on each request
+    :param fetcher: Fetcher to share, one is created if None
+    '''
+
+    def __init__(self, workers=8, perHost=4, timeout=10, fetcher=None):
+        self.workers = workers
+        self.perHost = perHost
+        self.timeout = timeout
+        self.fetcher = fetcher or Fetcher(timeout=timeout, perHost=perHost)
+        self.hosts = defaultdict(lambda: BoundedSemaphore(self.perHost))
+        self.hostsLock = Lock()
+
+    def hostLimit(self, url):
+        '''
+        :param url: a URL in string format
+        :return: semaphore bounding requests to the URL's host
+        '''
+        with self.hostsLock:
+            return self.hosts[urlparse(url).netloc]
+
+    def visit(self, sitemap):
+        '''
+        Stream one sitemap and sort its locations. The host slot is held
+        until the body has been read. A sitemap that cannot be fetched or
+        parsed keeps what was read before the error.
+
+        :param entry: a url or sitemap entry streamed from the sitemap
+        :param nested: sitemap locations listed in a sitemap index
+        :param urlCount: Integer sum of URLs found in a flat sitemap
+        :param error: why the sitemap could not be read, or None
+        :return: dictionary of the sitemap's nested sitemaps, URL count,
+            timing and error
+        '''
+        nested = []
+        urlCount = 0
+        error = None
+        with self.hostLimit(sitemap):
+            started = time.time()
+            try:
+                for entry in sitemapEntries(sitemap, self.fetcher):
+                    if entry['kind'] == 'sitemap':
+                        nested.append(entry['loc'])
+                    else:
+                        urlCount += 1
+            except (requests.RequestException, etree.LxmlError, OSError,
+                    EOFError) as e:
+                # Empty, broken or unreachable sitemaps count what was read
+                error = '%s: %s' % (type(e).__name__, e)
+            elapsed = time.time() - started
+        if nested:
+            # Sitemap is an index of nested sitemaps
+            urlCount = 0
+        return {'sitemap': sitemap,
+                'nested': nested,
+                'urls': urlCount,
+                'seconds': elapsed,
+                'error': error}
+
+    def walk(self, sitemap):
+        '''
+        Count the URLs in sitemaps, expanding indexes breadth first. Each
+        level of the tree is fetched concurrently and a sitemap listed twice
+        is only counted once.
+
+        :param sitemap: a list or string of xml sitemap locations
+        :param level: the sitemaps to fetch next
+        :param seen: sitemap locations already queued
+        :param timings: a dictionary per sitemap fetched
+        :return: tuple of the integer sum of URLs and the list of timings
+        '''
+        level = list(sitemap) if isinstance(sitemap, list) else [sitemap]
+        seen = set(level)
+        timings = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while level:
+                visited = list(pool.map(self.visit, level))
+                level = []
+                for result in visited:
+                    for nested in result.pop('nested'):
+                        if nested not in seen:
+                            seen.add(nested)
+                            level.append(nested)
+                    timings.append(result)
+        return sum(t['urls'] for t in timings), timings
+
+    def resolves(self, guess):
+        '''
+        Check a guessed sitemap location resolves without redirecting
+
+        :param guessPath: String of guessed path
+        :param responsePath: string of the returned path from request object
+        :return: boolean, False if the guess could not be fetched
+        '''
+        with self.hostLimit(guess):
+            try:
+                # Only the status and final URL matter, leave the body unread
+                r = self.fetcher.open(guess)
+                r.close()
+            except requests.RequestException:
+                return False
+        # match guessed path of response to make sure page resolves
+        guessPath = urlparse(guess).path
+        responsePath = urlparse(r.url).path
+        return r.status_code == 200 and guessPath == responsePath
+
+
+def findSitemap(url, walker=None):
     '''
     Find the location of an xml sitemap
 
     :param url: a URL in string format
+    :param walker: SitemapWalker to fetch robots.txt and guesses with, one
+        is made if None
     :param robotUrl: The url string of the robots.txt location
     :param robots: The parsed robots.txt patterns from a website
     :param common_locations: a list of common sitemap naming conventions
-    :param discoveredSitemaps: a list to store discovered XML sitemaps
-    :param makeUrl: Parse input URL to create sitemap location guesses
-    :param guessed_sitemap: Mutate input URL into a guessed location
-    :param guess: String of sitemap guess URL
-    :param r: guessed sitemap request object
-    :param guessPath: String of guessed path
-    :param responsePath: string of the returned path from request object
+    :param guesses: URL strings of the guessed sitemap locations
+    :param resolved: whether each guess resolved, in the same order
     :return: A list of discovered XML sitemap URLs
     '''
+    walker = walker or SitemapWalker()
     # Website is using best practices
     robotUrl = Robots.robots_url(url)
-    robots = Robots.fetch(robotUrl)
-    if len(list(robots.sitemaps)) == 0:
-        pass
-    else:
-        return list(robots.sitemaps)
+    try:
+        with walker.hostLimit(robotUrl):
+            r = walker.fetcher.fetch(robotUrl)
+        if r.status == 200:
+            robots = Robots.parse(robotUrl, r.text)
+            if len(list(robots.sitemaps)) > 0:
+                return list(robots.sitemaps)
+    except requests.RequestException as e:
+        print(e, e.args, 'failed while fetching %s' % (robotUrl))
     # Website is not using best practice so take some guesses
     common_locations = ['/sitemap.xml', '/sitemap_index.xml']
-    discoveredSitemaps = []
-    while len(common_locations) > 0:
-        makeUrl = urlparse(url)
-        guessed_sitemap = makeUrl._replace(path=common_locations.pop(0))
-        guess = guessed_sitemap.geturl()
-        r = requests.get(guess)
-        # match guessed path of response to make sure page resolves
-        guessPath = urlparse(guess).path
-        responsePath = urlparse(r.url).path
-        if r.status_code == 200 and guessPath == responsePath:
-            discoveredSitemaps.append(guess)
-        else:
-            pass
-        return [] if len(discoveredSitemaps) == 0 else discoveredSitemaps
+    makeUrl = urlparse(url)
+    guesses = [makeUrl._replace(path=path).geturl()
+               for path in common_locations]
+    with ThreadPoolExecutor(max_workers=len(guesses)) as pool:
+        resolved = list(pool.map(walker.resolves, guesses))
+    return [guess for guess, ok in zip(guesses, resolved) if ok]
+
+
+def walkSitemaps(sitemap, workers=8, perHost=4):
+    '''
+    Count the number of URLs in XML sitemaps and time each fetch
+
+    :param sitemap: a list or string of xml sitemap locations
+    :param workers: size of the thread pool fetching sitemaps
+    :param perHost: the most requests in flight against one host
+    :return: tuple of the integer sum of URLs and a list of dictionaries
+        with each sitemap's location, URL count, fetch time in seconds and
+        error if it could not be read
+    '''
+    return SitemapWalker(workers, perHost).walk(sitemap)
 
 
 def countSitemapLinks(sitemap):
@@ -65,36 +322,11 @@ def countSitemapLinks(sitemap):
     Count the number of URLs in an XML sitemap
 
     :param sitemap: a list or string of xml sitemap locations
-    :param sitemapList: a list which holds nested sitemaps locations
-    :param linksFound: List of integers that are sum of URLs from each sitemap
-    :param s: sitemap URL location string
-    :param r: request object visiting the sitemap location
-    :param soup: BeautifulSoup object structuring sitemap response
-    :param urlCount: Integer sum of URLs found in sitemap
+    :param linksFound: Integer sum of URLs from every sitemap
     :return: Integer sum of all URLs discovered
     '''
-    sitemapList = []
-    # Type validation for sitemap variable
-    if isinstance(sitemap, list):
-        for s in sitemap:
-            sitemapList.append(s)
-    else:
-        sitemapList.append(sitemap)
-    linksFound = []
-    # Sum links found within known sitemaps
-    while len(sitemapList) > 0:
-        s = sitemapList.pop(0)
-        r = requests.get(s)
-        soup = BeautifulSoup(r.text, 'lxml')
-        if len(soup.find_all('sitemap')) > 0:
-            # Sitemap is an index of nested sitemaps
-            for eachSitemap in soup.find_all('sitemap'):
-                sitemapList.append(eachSitemap.loc.text)
-        else:
-            # Sitemap is flat
-            urlCount = len(soup.find_all('loc'))
-            linksFound.append(urlCount)
-    return sum(linksFound)
+    linksFound, timings = walkSitemaps(sitemap)
+    return linksFound
 
 
 def main(argv):
@@ -104,10 +336,14 @@ def main(argv):
 
     :param known_sitemaps: a list or string of discovered xml sitemaps
     :param site_size: Integer sum of all URLs within a sitemap
+    :param timings: URL count and fetch time for each sitemap
     :return: None
     '''
     known_sitemaps = findSitemap(argv[0])
-    site_size = countSitemapLinks(known_sitemaps)
+    site_size, timings = walkSitemaps(known_sitemaps)
+    for t in timings:
+        print('%.2fs %6d URLs %s %s' % (t['seconds'], t['urls'],
+                                        t['sitemap'], t['error'] or ''))
     print('%s URLs discovered while scanning known sitemaps' % (site_size))
     return None
 
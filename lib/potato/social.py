@@ -1,10 +1,142 @@
 '''
 A class that identifies social media accounts by parsing a webpage's html
+
+Links are matched on their parsed hostname against a trie of the known
+social media hosts, built once when the class loads, so each link costs a
+walk of a few hostname labels rather than a substring scan of every known
+host, and 'medium' no longer matches mediumsizedbusiness.com.
 '''
 
 __author__ = 'Kevin Tarvin'
-import tldextract
-from bs4 import BeautifulSoup
+import re
+from urllib.parse import urlparse
+from lib.potato import domains
+from lib.potato.onpage import PageParse
+
+# Hostname labels that say nothing about whose profile a link is, along
+# with locales such as en-gb or es
+HOST_PREFIXES = {'www', 'm', 'mobile'}
+LOCALE = re.compile(r'^[a-z]{2}(-[a-z]{2,4})?$')
+# Platforms that give each profile a subdomain, e.g. <handle>.tumblr.com
+SUBDOMAIN_PROFILES = {'tumblr', 'blogspot', 'wordpress', 'livejournal',
+                      'bandcamp', 'deviantart', 'hubpages'}
+# Subdomains of a platform that never hold profiles, e.g. link redirects
+NOT_PROFILE_HOSTS = {'l', 'lm', 'developers', 'developer', 'business',
+                     'help', 'support', 'docs', 'api', 'ads'}
+# Path segments that come before a handle, e.g. youtube.com/user/<handle>
+PATH_PREFIXES = {'user', 'users', 'u', 'c', 'channel', 'company', 'in',
+                 'pages', 'pg', 'people', 'profile', 'companies', 'biz', 'usr'}
+# First path segments of links that are not a profile, e.g. share buttons
+NOT_PROFILES = {'share', 'sharer', 'sharer.php', 'share.php', 'intent',
+                'home', 'watch', 'embed', 'search', 'hashtag', 'explore',
+                'p', 'status', 'dialog', 'plugins', 'login', 'signup',
+                'profile.php', 'sharearticle', 'pin', 'tr', 'wiki'}
+
+
+def splitHost(host):
+    '''
+    Split a hostname into its labels and the labels before its public
+    suffix
+
+    :param host: a lowercase hostname
+    :return: tuple of the platform's domain name, every label and the
+        labels without the public suffix
+    '''
+    parts = domains.parts(host)
+    labels = tuple(host.split('.'))
+    named = [label for label in parts.subdomain.split('.') if label]
+    if parts.domain:
+        named.append(parts.domain)
+    return parts.domain, labels, tuple(named)
+
+
+class SocialMatcher(object):
+    '''
+    A trie of social media hosts keyed on their hostname labels from right
+    to left. A known host may be a full domain such as behance.net, or a
+    name without its public suffix such as facebook, which then matches
+    facebook.com, facebook.de or facebook.co.uk alike.
+
+    :param names: hosts or host names without a suffix to match
+    '''
+
+    def __init__(self, names):
+        self.root = {}
+        for name in names:
+            node = self.root
+            for label in reversed(name.lower().split('.')):
+                node = node.setdefault(label, {})
+            node[None] = name
+
+    def walk(self, labels):
+        '''
+        :param labels: hostname labels, right to left
+        :return: tuple of the longest known host matched and how many
+            labels it took, or None
+        '''
+        node = self.root
+        found = None
+        for depth, label in enumerate(labels, 1):
+            node = node.get(label)
+            if node is None:
+                break
+            if None in node:
+                found = (node[None], depth)
+        return found
+
+    def match(self, url):
+        '''
+        Identify the social media profile a URL links to
+
+        :param url: an absolute URL
+        :param host: the URL's lowercase hostname
+        :param left: labels left of the matched host
+        :param extra: those labels without prefixes, a handle on sites
+            giving each profile a subdomain
+        :return: dictionary of the platform, profile handle or None, and
+            URL, or None if the URL is not on a known social media host or
+            on one of its hosts that never holds profiles
+        '''
+        parsed = urlparse(url)
+        host = (parsed.hostname or '').rstrip('.')
+        if not host:
+            return None
+        domain, labels, named = splitHost(host)
+        for candidates in (named, labels):
+            found = self.walk(reversed(candidates))
+            if found is not None:
+                break
+        else:
+            return None
+        name, depth = found
+        left = candidates[:len(candidates) - depth]
+        extra = [label for label in left
+                 if label not in HOST_PREFIXES and not LOCALE.match(label)]
+        if domain in SUBDOMAIN_PROFILES and extra:
+            handle = '.'.join(extra)
+        elif NOT_PROFILE_HOSTS.intersection(left):
+            return None
+        else:
+            handle = pathHandle(parsed.path)
+        return {'platform': domain, 'handle': handle, 'url': url}
+
+
+def pathHandle(path):
+    '''
+    Read a profile handle from a social media URL's path
+
+    :param path: the path of the URL
+    :param segments: non-empty path segments
+    :return: the handle lowercased without a leading @ or +, or None if the
+        path does not point at a profile
+    '''
+    segments = [s for s in path.split('/') if s]
+    while segments and segments[0].lower() in PATH_PREFIXES:
+        segments = segments[1:]
+    if not segments or segments[0].lower() in NOT_PROFILES:
+        return None
+    handle = segments[0].lstrip('@+').lower()
+    return handle or None
 
 
 class SocialParse(object):
@@ -143,30 +275,34 @@ class SocialParse(object):
             'qq.com',
             'weibo.com',
             'ok.ru']
+    matcher = SocialMatcher(socials)
 
-    def __init__(self, html, url):
+    def __init__(self, html, url, parser=None):
         '''
-        Pass the webpage's HTML as a string which is then turned into a
-        BeautifulSoup object.
+        Pass the webpage's HTML as a string, or a Document that has already
+        been parsed, which is then used as a BeautifulSoup object.
 
-        :param html: the html string passed into this class
+        :param html: the html string or parsed Document passed into this class
         :param url: the URL associated with the webpage's HTML
+        :param parser: parser backend used when html is still a string
+        :param page: PageParse sharing the document's single tag traversal
         :param soup: The HTML string as a BeautifulSoup Object
         '''
-        self.html = html
+        self.page = PageParse(html, url, parser)
+        self.html = self.page.html
         self.url = url
-        self.soup = BeautifulSoup(html, 'html5lib')
+        self.soup = self.page.soup
 
     def gethrefs(self):
         '''
         Find and return all absolute URLs on the page
 
-        :param hrefs: A list of extracted anchor tags with hrefs
-        :param data: a list of hrefs extracted from the 'href' soup parsing
+        :param hrefs: A list of hrefs extracted from anchor tags
+        :param data: a list of the absolute hrefs
         :return: a list of all anchor tag hrefs withing the html doc
         '''
-        hrefs = self.soup.find_all('a', href=True)
-        data = [link['href'] for link in hrefs if 'http' in link['href']]
+        hrefs = self.page.hrefs()
+        data = [href for href in hrefs if 'http' in href]
         return data
 
     def getDomain(self, href):
@@ -175,22 +311,33 @@ class SocialParse(object):
 
         :return: A string extracted from the URL's domain
         '''
-        return tldextract.extract(href).domain
+        return domains.name(href)
 
-    def socialmedia(self):
+    def profiles(self):
         '''
-        String match unique fragments of known social media domains against
-        the URLs extracted from a webpage.
+        Identify the social media profiles a webpage links to by hostname
 
         :param hrefs: a list of hrefs
-        :param results: Filter href list against social list to find matches
+        :return: a list of dictionaries of each link's platform, normalized
+            profile handle and URL
+        '''
+        found = []
+        for href in self.gethrefs():
+            profile = self.matcher.match(href)
+            if profile is not None:
+                found.append(profile)
+        return found
+
+    def socialmedia(self):
+        '''
+        Match the hostnames of the URLs extracted from a webpage against
+        known social media hosts.
+
         :param data: An initialized dictionary where results will be added
         :return: a dictonary of social media links found on a specific URL
         :return type: dictionary - keys = social media name, value = URL
         '''
-        hrefs = self.gethrefs()
-        results = [href for s in self.socials for href in hrefs if s in href]
         data = {'url': self.url}
-        for result in results:
-            data.update({self.getDomain(result): result})
+        for profile in self.profiles():
+            data.update({profile['platform']: profile['url']})
         return data
@@ -0,0 +1,133 @@
+'''
+Normalize the URLs found on a webpage so that one page has one URL.
+
+Links are resolved against the page's <base> or its own URL, then put in a
+canonical form: lowercase scheme and host, no default port, no fragment,
+no tracking parameters, query parameters sorted and no trailing slash
+after a path. Crawlers compare and deduplicate links in that form, so
+/about, /about/ and /about?utm_source=x are fetched once.
+
+Links count as internal when they share the page's registered domain, so
+a site reached through a redirect from http to https, or from the bare
+domain to www, keeps its links.
+'''
+
+__author__ = 'Kevin Tarvin'
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+from lib.potato import domains
+
+SCHEMES = ('http', 'https')
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+TRACKING_PREFIXES = ('utm_',)
+TRACKING_PARAMS = {'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'igshid',
+                   'mc_cid', 'mc_eid', '_ga', '_gl', '_hsenc', '_hsmi',
+                   'mkt_tok', 'vero_id', 'oly_enc_id', 'oly_anon_id'}
+
+
+def isTracking(key):
+    '''
+    :param key: a query parameter name
+    :return: True for parameters that only identify a campaign or click
+    '''
+    key = key.lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES)
+
+
+def normalize(url):
+    '''
+    Put an absolute http(s) URL in canonical form
+
+    :param url: an absolute URL in string format
+    :param parts: the URL split into scheme, netloc, path, query, fragment
+    :param query: the query parameters kept, sorted by name then value
+    :return: the canonical URL, or None if it is not an http(s) URL
+    '''
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').rstrip('.')
+    if scheme not in SCHEMES or not host:
+        return None
+    if ':' in host:
+        host = '[{0}]'.format(host)
+    netloc = host if port in (None, DEFAULT_PORTS[scheme]) else \
+        '{0}:{1}'.format(host, port)
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/') or '/'
+    query = sorted((k, v) for k, v in parse_qsl(parts.query,
+                                                keep_blank_values=True)
+                   if not isTracking(k))
+    return urlunsplit((scheme, netloc, path, urlencode(query), ''))
+
+
+def resolve(href, base):
+    '''
+    Resolve a link against the URL it appears on and normalize it
+
+    :param href: the href attribute of a link
+    :param base: the page's base URL
+    :return: the canonical absolute URL, or None for links that are not
+        webpages such as mailto:, javascript: or a bare #fragment
+    '''
+    href = href.strip()
+    if not href or href.startswith('#'):
+        return None
+    return normalize(urljoin(base, href))
+
+
+def discover(page):
+    '''
+    The distinct webpages a page links to, in the order first linked
+
+    :param page: a PageParse of the webpage
+    :param base: the URL relative links resolve against
+    :return: a list of canonical absolute URLs
+    '''
+    base = page.baseUrl()
+    seen = set()
+    links = []
+    for href in page.hrefs():
+        link = resolve(href, base)
+        if link is not None and link not in seen:
+            seen.add(link)
+            links.append(link)
+    return links
+
+
+def site(url):
+    '''
+    :param url: a URL in string format
+    :return: the registered domain of the URL, or its host when it has none
+        such as an IP address or localhost
+    '''
+    return domains.registeredDomain(url) or domains.host(url)
+
+
+def internal(links, url):
+    '''
+    The links that stay on the site of a page
+
+    :param links: a list of absolute URL strings found on the page
+    :param url: the URL the page was served from, after any redirect
+    :return: the links on the same site, in input order
+    '''
+    home = site(url)
+    return [link for link in links if site(link) == home]
+
+
+def canonical(page):
+    '''
+    The canonical URL a page declares, as a hint of which URL it
+    duplicates
+
+    :param page: a PageParse of the webpage
+    :return: a canonical absolute URL or None
+    '''
+    declared = page.canoncial()
+    if not declared:
+        return None
+    return resolve(declared, page.baseUrl())
@@ -1,5 +1,6 @@
 from flask import Flask
 from celery import Celery
+from kombu import Queue
 
 from mpscanner.blueprints.page import page
 from mpscanner.blueprints.contact import contact
@@ -9,6 +10,7 @@ from mpscanner.extensions import (
     mail,
     csrf,
     mongo,
+    redis_store,
 )
 
 CELERY_TASK_LIST = [
@@ -16,6 +18,36 @@ CELERY_TASK_LIST = [
     'mpscanner.blueprints.analyze.tasks'
 ]
 
+# Work is split by origin so a long bulk batch never delays a crawl someone
+# is waiting on: interactive single site crawls, bulk batches and sitemap
+# walks each get a queue and their own workers, anything else stays on the
+# default queue. Pages fetched on those queues are parsed on the extract
+# queue, whose workers are sized to the CPU instead of the network. Workers
+# take one message at a time and acknowledge it once done, so a busy worker
+# never sits on prefetched crawls. Redis serves priority 0 first, and
+# redelivers unacknowledged messages only after the visibility timeout,
+# which has to outlast the longest crawl countdown. Old style setting names
+# are used to match the CELERY_ names in the app config, which Celery
+# refuses to mix with new ones.
+CELERY_ROUTING = {
+    'CELERY_DEFAULT_QUEUE': 'celery',
+    'CELERY_QUEUES': [Queue('celery'), Queue('interactive'), Queue('bulk'),
+                      Queue('sitemap'), Queue('extract')],
+    'CELERY_ROUTES': {
+        'mpscanner.blueprints.analyze.tasks.crawl': {'queue': 'interactive'},
+        'mpscanner.blueprints.analyze.tasks.submit_batch': {'queue': 'bulk'},
+        'mpscanner.blueprints.analyze.tasks.sitemap_links': {
+            'queue': 'sitemap'},
+        'mpscanner.blueprints.analyze.tasks.extract_page': {
+            'queue': 'extract'},
+    },
+    'CELERYD_PREFETCH_MULTIPLIER': 1,
+    'CELERY_ACKS_LATE': True,
+    'BROKER_TRANSPORT_OPTIONS': {'priority_steps': list(range(10)),
+                                 'queue_order_strategy': 'priority',
+                                 'visibility_timeout': 43200},
+}
+
 
 def create_celery_app(app=None):
     """
@@ -29,6 +61,7 @@ def create_celery_app(app=None):
 
     celery = Celery(app.import_name, broker=app.config['CELERY_BROKER_URL'],
                     include=CELERY_TASK_LIST)
+    celery.conf.update(CELERY_ROUTING)
     celery.conf.update(app.config)
     TaskBase = celery.Task
 
@@ -77,5 +110,6 @@ def extensions(app):
     mail.init_app(app)
     csrf.init_app(app)
     mongo.init_app(app)
+    redis_store.init_app(app)
 
     return None
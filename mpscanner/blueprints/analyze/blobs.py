@@ -0,0 +1,45 @@
+import base64
+import uuid
+import zlib
+
+from mpscanner.extensions import redis_store
+
+
+def put(content, ttl=3600):
+    """
+    Keep a response body in Redis so tasks can pass it by reference instead
+    of inside the broker message. Bodies are compressed, and base64 encoded
+    since the Redis client decodes every reply as text.
+
+    :param content: Response body
+    :type content: bytes
+    :param ttl: Seconds the body is kept if nobody discards it
+    :type ttl: int
+    :return: Key of the body
+    """
+    key = 'blob:{0}'.format(uuid.uuid4().hex)
+    data = base64.b64encode(zlib.compress(content, 1)).decode('ascii')
+    redis_store.setex(key, ttl, data)
+    return key
+
+
+def get(key):
+    """
+    :param key: Key of a body
+    :type key: str
+    :return: The body as bytes, or None once it has expired
+    """
+    data = redis_store.get(key)
+    if data is None:
+        return None
+    return zlib.decompress(base64.b64decode(data))
+
+
+def discard(key):
+    """
+    :param key: Key of a body no longer needed
+    :type key: str
+    :return: None
+    """
+    redis_store.delete(key)
+    return None
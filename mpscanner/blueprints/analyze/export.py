@@ -0,0 +1,364 @@
+import csv
+import io
+import json
+import zlib
+
+from lib.potato.extract import FIELDS
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+NUMBERS = {'int', 'long', 'double', 'decimal'}
+
+
+def columns(collection, query):
+    """
+    Describe the crawl_data columns of the pages matching a query, the same
+    ones the DataFrame export had: every key some page holds. Mongo groups
+    the keys without reading the pages into the web process, and reports
+    how many pages hold a value for each and which BSON types those values
+    have.
+
+    :param collection: Collection of crawled pages
+    :type collection: pymongo.collection.Collection
+    :param query: Filter selecting the pages
+    :type query: dict
+    :return: List of (name, as_float) tuples in column order
+    """
+    total = collection.count_documents(query)
+    pipeline = [
+        {'$match': query},
+        {'$project': {'_id': 0, 'field': {'$objectToArray': '$crawl_data'}}},
+        {'$unwind': '$field'},
+        {'$group': {
+            '_id': '$field.k',
+            'values': {'$sum': {'$cond': [{'$eq': ['$field.v', None]}, 0, 1]}},
+            'types': {'$addToSet': {'$type': '$field.v'}}}}]
+    found = []
+    for c in collection.aggregate(pipeline, allowDiskUse=True):
+        types = set(c['types']) - {'null'}
+        # A numeric column with gaps or decimals was a float column in the
+        # DataFrame export, so every value in it is written as a float
+        numeric = types and types <= NUMBERS
+        as_float = bool(numeric and ('double' in types or c['values'] < total))
+        found.append((c['_id'], as_float))
+    return sorted(found)
+
+
+def cell(value, as_float):
+    """
+    Render a value the way DataFrame.to_csv does: missing values are
+    empty, lists and dicts such as hreflangValues are written as their
+    Python representation.
+
+    :param value: Value of a crawl_data field
+    :param as_float: True if the column holds floats
+    :type as_float: bool
+    :return: str
+    """
+    if value is None:
+        return ''
+    if as_float:
+        return repr(float(value))
+    if isinstance(value, str):
+        return value
+    return str(value)
+
+
+def csvRows(collection, query, batch_size=500, rows=100):
+    """
+    Stream the crawl_data of the pages matching a query as CSV with the
+    same columns and index as the DataFrame export. Pages are read with a
+    projection through a batched cursor and written a few rows at a time,
+    so memory does not grow with the size of the report.
+
+    :param collection: Collection of crawled pages
+    :type collection: pymongo.collection.Collection
+    :param query: Filter selecting the pages
+    :type query: dict
+    :param batch_size: Documents fetched from Mongo per round trip
+    :type batch_size: int
+    :param rows: CSV rows written per chunk
+    :type rows: int
+    :return: Generator of CSV text chunks
+    """
+    fields = columns(collection, query)
+    if not fields:
+        yield '""\n'
+        return
+    buffer = io.StringIO()
+    out = csv.writer(buffer, lineterminator='\n')
+    out.writerow([''] + [name for name, _ in fields])
+    pages = collection.find(query, {'crawl_data': 1, '_id': 0},
+                            batch_size=batch_size)
+    for i, page in enumerate(pages):
+        data = page.get('crawl_data') or {}
+        out.writerow([i] + [cell(data.get(name), as_float)
+                            for name, as_float in fields])
+        if i % rows == rows - 1:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def text(value):
+    """
+    :return: A str or None
+    """
+    return None if value is None else str(value)
+
+
+def integer(value):
+    """
+    :return: An int or None
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def number(value):
+    """
+    :return: A float or None
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def boolean(value):
+    """
+    :return: A bool or None
+    """
+    return None if value is None else bool(value)
+
+
+def strings(value):
+    """
+    :return: A list of str
+    """
+    # Extractors return '' rather than an empty list when nothing is found
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(v) for v in value]
+
+
+def language(value):
+    """
+    :return: A language detection dict or None
+    """
+    if not isinstance(value, dict):
+        return None
+    return {'language': text(value.get('language')),
+            'confidence': text(value.get('confidence'))}
+
+
+def alternates(value):
+    """
+    :return: A list of hreflang/loc dicts
+    """
+    # hreflangValues is the string 'None' when a page has no alternates
+    if not isinstance(value, list):
+        return []
+    return [{'hreflang': text(v.get('hreflang')), 'loc': text(v.get('loc'))}
+            for v in value if isinstance(v, dict)]
+
+
+def stats(value):
+    """
+    :return: A content statistics dict or None
+    """
+    if not isinstance(value, dict):
+        return None
+    return {'words': integer(value.get('words')),
+            'unique_words': integer(value.get('unique_words')),
+            'top_terms': [{'term': text(t[0]), 'n': integer(t[1])}
+                          for t in value.get('top_terms') or []],
+            'text_html_ratio': number(value.get('text_html_ratio')),
+            'reading_ease': number(value.get('reading_ease')),
+            'grade_level': number(value.get('grade_level'))}
+
+
+# How each kind of webpageData field is coerced to its schema type
+COERCE = {'str': text, 'int': integer, 'float': number, 'bool': boolean,
+          'strlist': strings, 'lang': language, 'hreflang': alternates,
+          'stats': stats}
+
+
+def record(data):
+    """
+    Coerce a page's crawl_data to the export schema: every field in
+    FIELDS order, missing ones as None, and the loose values extractors
+    fall back to replaced by typed ones.
+
+    :param data: crawl_data of a page
+    :type data: dict
+    :return: dict
+    """
+    return {name: COERCE[kind](data.get(name)) for name, kind in FIELDS}
+
+
+def arrowSchema():
+    """
+    Build the Arrow schema of an export from FIELDS.
+
+    :return: pyarrow.Schema
+    """
+    if pa is None:
+        raise RuntimeError('Columnar exports require pyarrow to be installed')
+    lang = pa.struct([('language', pa.string()), ('confidence', pa.string())])
+    types = {
+        'str': pa.string(),
+        'int': pa.int64(),
+        'float': pa.float64(),
+        'bool': pa.bool_(),
+        'strlist': pa.list_(pa.string()),
+        'lang': lang,
+        'hreflang': pa.list_(pa.struct([('hreflang', pa.string()),
+                                        ('loc', pa.string())])),
+        'stats': pa.struct([
+            ('words', pa.int64()),
+            ('unique_words', pa.int64()),
+            ('top_terms', pa.list_(pa.struct([('term', pa.string()),
+                                              ('n', pa.int64())]))),
+            ('text_html_ratio', pa.float64()),
+            ('reading_ease', pa.float64()),
+            ('grade_level', pa.float64())])}
+    return pa.schema([pa.field(name, types[kind]) for name, kind in FIELDS])
+
+
+def records(collection, query, batch_size=500):
+    """
+    Read the pages matching a query as schema records, batch_size at a
+    time through a cursor projected down to crawl_data.
+
+    :param collection: Collection of crawled pages
+    :type collection: pymongo.collection.Collection
+    :param query: Filter selecting the pages
+    :type query: dict
+    :param batch_size: Documents fetched from Mongo per round trip
+    :type batch_size: int
+    :return: Generator of lists of records
+    """
+    pages = collection.find(query, {'crawl_data': 1, '_id': 0},
+                            batch_size=batch_size)
+    batch = []
+    for page in pages:
+        batch.append(record(page.get('crawl_data') or {}))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ChunkSink(io.RawIOBase):
+    """
+    A write-only file that holds what was written until it is drained, so
+    a columnar writer can stream into an HTTP response. It keeps counting
+    its position across drains since writers record offsets with tell.
+    """
+
+    def __init__(self):
+        super(ChunkSink, self).__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        """
+        :return: Bytes written since the last drain
+        """
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def columnarRows(collection, query, kind, batch_size=500):
+    """
+    Stream the pages matching a query as a Parquet file or an Arrow IPC
+    stream with the FIELDS schema, one record batch (or row group) per
+    cursor batch.
+
+    :param collection: Collection of crawled pages
+    :type collection: pymongo.collection.Collection
+    :param query: Filter selecting the pages
+    :type query: dict
+    :param kind: parquet or arrow
+    :type kind: str
+    :param batch_size: Pages per record batch
+    :type batch_size: int
+    :return: Generator of byte chunks
+    """
+    schema = arrowSchema()
+    sink = ChunkSink()
+    if kind == 'parquet':
+        out = pq.ParquetWriter(sink, schema, compression='snappy')
+    else:
+        out = pa.ipc.new_stream(sink, schema)
+    for batch in records(collection, query, batch_size):
+        arrays = [pa.array([r[f.name] for r in batch], type=f.type)
+                  for f in schema]
+        out.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+    out.close()
+    yield sink.drain()
+
+
+def ndjsonRows(collection, query, batch_size=500):
+    """
+    Stream the pages matching a query as gzip compressed newline delimited
+    JSON, one schema record per line.
+
+    :param collection: Collection of crawled pages
+    :type collection: pymongo.collection.Collection
+    :param query: Filter selecting the pages
+    :type query: dict
+    :param batch_size: Pages compressed per chunk
+    :type batch_size: int
+    :return: Generator of byte chunks
+    """
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for batch in records(collection, query, batch_size):
+        lines = ''.join(json.dumps(r, ensure_ascii=False) + '\n'
+                        for r in batch)
+        yield gzip.compress(lines.encode('utf-8'))
+    yield gzip.flush()
+
+
+# Export formats: (mimetype, filename, rows generator, needs pyarrow)
+FORMATS = {
+    'csv': ('text/csv', 'export.csv', csvRows, False),
+    'parquet': ('application/vnd.apache.parquet', 'export.parquet',
+                lambda c, q: columnarRows(c, q, 'parquet'), True),
+    'arrow': ('application/vnd.apache.arrow.stream', 'export.arrows',
+              lambda c, q: columnarRows(c, q, 'arrow'), True),
+    'ndjson': ('application/gzip', 'export.ndjson.gz', ndjsonRows, False),
+}
+
+
+def available(fmt):
+    """
+    :param fmt: Name of an export format
+    :type fmt: str
+    :return: True if the format exists and its dependencies are installed
+    """
+    return fmt in FORMATS and (pa is not None or not FORMATS[fmt][3])
@@ -0,0 +1,229 @@
+import uuid
+from urllib.parse import urlparse
+
+from lib.potato.extract import websiteDomain
+from mpscanner.extensions import redis_store
+
+# Queue every URL not seen before, scored by priority, and remember it.
+# KEYS: seen set, queue sorted set
+# ARGV: depth, then score and URL pairs
+ADD_SCRIPT = """
+local added = 0
+for i = 2, #ARGV, 2 do
+  if redis.call('SADD', KEYS[1], ARGV[i + 1]) == 1 then
+    redis.call('ZADD', KEYS[2], ARGV[i], ARGV[1] .. ' ' .. ARGV[i + 1])
+    added = added + 1
+  end
+end
+return added
+"""
+
+# Pop the best queued URLs while the page budget allows.
+# KEYS: queue sorted set, scheduled counter
+# ARGV: page budget, most URLs to pop
+POP_SCRIPT = """
+local popped = {}
+for i = 1, tonumber(ARGV[2]) do
+  if tonumber(redis.call('GET', KEYS[2]) or '0') >= tonumber(ARGV[1]) then
+    break
+  end
+  local item = redis.call('ZRANGE', KEYS[1], 0, 0)
+  if #item == 0 then
+    break
+  end
+  redis.call('ZREM', KEYS[1], item[1])
+  redis.call('INCR', KEYS[2])
+  table.insert(popped, item[1])
+end
+return popped
+"""
+
+
+def priority(url, depth):
+    """
+    Score a URL for the frontier, lower scores are crawled first. Shallow
+    pages win, then pages with shorter paths.
+
+    :param url: URL to score
+    :type url: str
+    :param depth: Number of links followed from the seed URL
+    :type depth: int
+    :return: float
+    """
+    segments = len([s for s in urlparse(url).path.split('/') if s])
+    return depth + min(segments, 99) / 100.0
+
+
+class Frontier(object):
+    """
+    The crawl state of one site held in Redis: a priority queue of URLs to
+    visit, the set of URLs already queued, and page and depth budgets.
+    Workers share it, so a crawl is a chain of independent page tasks rather
+    than a recursion on one worker's call stack.
+    """
+
+    def __init__(self, crawl_id):
+        """
+        :param crawl_id: Identifier of the crawl
+        :type crawl_id: str
+        """
+        self.crawl_id = crawl_id
+        self.prefix = 'frontier:{0}'.format(crawl_id)
+        self.meta = redis_store.hgetall(self.key('meta'))
+
+    def key(self, name):
+        return '{0}:{1}'.format(self.prefix, name)
+
+    @classmethod
+    def create(cls, url, batch_id='', budget=10, max_depth=3, ttl=86400,
+               queue='interactive'):
+        """
+        Start the crawl state for a site.
+
+        :param url: Seed URL
+        :type url: str
+        :param batch_id: Batch the crawl belongs to
+        :type batch_id: str
+        :param budget: Most pages to crawl
+        :type budget: int
+        :param max_depth: Most links to follow away from the seed URL
+        :type max_depth: int
+        :param ttl: Seconds the crawl state is kept in Redis
+        :type ttl: int
+        :param queue: Celery queue the crawl's pages are fetched on
+        :type queue: str
+        :return: Frontier
+        """
+        crawl_id = str(uuid.uuid4())
+        key = 'frontier:{0}:meta'.format(crawl_id)
+        redis_store.hmset(key, {'seed': url,
+                                'batch_id': batch_id,
+                                'budget': budget,
+                                'max_depth': max_depth,
+                                'ttl': ttl,
+                                'queue': queue})
+        redis_store.expire(key, ttl)
+        return cls(crawl_id)
+
+    @property
+    def seed(self):
+        return self.meta.get('seed', '')
+
+    @property
+    def batch_id(self):
+        return self.meta.get('batch_id', '')
+
+    @property
+    def queue(self):
+        return self.meta.get('queue', 'interactive')
+
+    @property
+    def budget(self):
+        return int(self.meta.get('budget', 0))
+
+    @property
+    def max_depth(self):
+        return int(self.meta.get('max_depth', 0))
+
+    def add(self, urls, depth):
+        """
+        Queue URLs that have not been seen during this crawl.
+
+        :param urls: URLs to queue
+        :type urls: list
+        :param depth: Number of links followed from the seed URL
+        :type depth: int
+        :return: Number of URLs queued
+        """
+        if depth > self.max_depth or not urls:
+            return 0
+        args = [depth]
+        for url in urls:
+            args.extend([priority(url, depth), url])
+        keys = [self.key('seen'), self.key('queue')]
+        added = redis_store.register_script(ADD_SCRIPT)(keys=keys, args=args)
+        self.touch()
+        return added
+
+    def mark_seen(self, urls):
+        """
+        Record URLs as already crawled without queueing them, such as a
+        page's canonical URL or where it redirected to.
+
+        :param urls: URLs the crawl should not fetch
+        :type urls: list
+        :return: None
+        """
+        if urls:
+            redis_store.sadd(self.key('seen'), *urls)
+            self.touch()
+        return None
+
+    def pop(self, count):
+        """
+        Take the best queued URLs, reserving a page of the budget for each.
+
+        :param count: Most URLs to take
+        :type count: int
+        :return: List of (url, depth) tuples
+        """
+        keys = [self.key('queue'), self.key('scheduled')]
+        popped = redis_store.register_script(POP_SCRIPT)(
+            keys=keys, args=[self.budget, count])
+        self.touch()
+        pages = []
+        for item in popped:
+            depth, url = item.split(' ', 1)
+            pages.append((url, int(depth)))
+        return pages
+
+    def scan_document(self, url, crawl_data, crawl_time):
+        """
+        The scan document of a page of this crawl. Every page is filed under
+        the seed's homepage, so a site keeps one summary and export even
+        when the seed redirects, to www for example, or links to subdomains.
+
+        :param url: URL of the page
+        :type url: str
+        :param crawl_data: Data extracted from the page
+        :type crawl_data: dict
+        :param crawl_time: When the page was crawled
+        :type crawl_time: datetime.datetime
+        :return: dict
+        """
+        homepage = websiteDomain(self.seed or url)
+        return {'crawl_data': crawl_data,
+                'crawl_time': crawl_time,
+                'homepage': homepage,
+                'uuid': str(uuid.uuid3(uuid.NAMESPACE_DNS, homepage)),
+                'batch_id': self.batch_id,
+                'url': url,
+                'crawl_id': self.crawl_id}
+
+    def page_stored(self):
+        """
+        Count a page written for this crawl, replacing a count of the scan
+        collection.
+
+        :return: Pages stored so far
+        """
+        return redis_store.incr(self.key('stored'))
+
+    def pages_stored(self):
+        """
+        :return: Pages stored so far
+        """
+        return int(redis_store.get(self.key('stored')) or 0)
+
+    def touch(self):
+        """
+        Keep every key of the crawl alive for the crawl's ttl.
+
+        :return: None
+        """
+        ttl = int(self.meta.get('ttl', 86400))
+        pipe = redis_store.pipeline()
+        for name in ('meta', 'seen', 'queue', 'scheduled', 'stored'):
+            pipe.expire(self.key(name), ttl)
+        pipe.execute()
+        return None
@@ -0,0 +1,60 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Indexes matching how each collection is queried:
+#   scan: export by uuid and batch_id, siteScanReport pages by uuid/_id,
+#         lookups by homepage/uuid and crawl result upserts by url/batch/crawl
+#   page_cache: revalidation lookups by url
+#   scan_summary: summary upserts by kind/key, report pages by last crawl
+#   trans: client reports by domain_name, translation pages by
+#          domain_name/_id, index lookups by website
+#   onelink: the reports list paged by domain_name
+INDEXES = {
+    'scan': [
+        IndexModel([('uuid', ASCENDING), ('crawl_time', ASCENDING)],
+                   name='uuid_crawl_time'),
+        IndexModel([('uuid', ASCENDING), ('_id', ASCENDING)],
+                   name='uuid_id'),
+        IndexModel([('batch_id', ASCENDING), ('crawl_time', ASCENDING)],
+                   name='batch_id_crawl_time'),
+        IndexModel([('homepage', ASCENDING), ('uuid', ASCENDING)],
+                   name='homepage_uuid'),
+        IndexModel([('url', ASCENDING), ('batch_id', ASCENDING),
+                    ('crawl_id', ASCENDING)],
+                   name='url_batch_id_crawl_id'),
+    ],
+    'page_cache': [
+        IndexModel([('url', ASCENDING)], name='url', unique=True),
+    ],
+    'scan_summary': [
+        IndexModel([('kind', ASCENDING), ('key', ASCENDING)],
+                   name='kind_key', unique=True),
+        IndexModel([('kind', ASCENDING), ('last_crawl', DESCENDING),
+                    ('_id', DESCENDING)],
+                   name='kind_last_crawl_id'),
+    ],
+    'trans': [
+        IndexModel([('domain_name', ASCENDING)], name='domain_name'),
+        IndexModel([('domain_name', ASCENDING), ('_id', ASCENDING)],
+                   name='domain_name_id'),
+        IndexModel([('website', ASCENDING)], name='website'),
+    ],
+    'onelink': [
+        IndexModel([('domain_name', ASCENDING), ('_id', ASCENDING)],
+                   name='domain_name_id'),
+    ],
+}
+
+
+def ensure_indexes(db):
+    """
+    Create every index in INDEXES. Indexes that already exist are left
+    alone, so this is safe to run on each start.
+
+    :param db: Mongo database
+    :type db: pymongo.database.Database
+    :return: Dict of collection name to the index names ensured
+    """
+    created = {}
+    for collection, indexes in INDEXES.items():
+        created[collection] = db[collection].create_indexes(indexes)
+    return created
@@ -0,0 +1,63 @@
+import time
+
+from lib.potato.extract import websiteDomain
+from mpscanner.extensions import redis_store
+from mpscanner.blueprints.analyze.politeness import RESERVE_SCRIPT
+
+DISPATCH_KEY = 'dispatch:next'
+
+
+def normalize_domains(lines):
+    """
+    Turn a pasted list of sites into the homepages to crawl: blank lines
+    are dropped, a missing scheme becomes http, hosts are lowercased and
+    repeats of a homepage are dropped, keeping the order they came in.
+
+    :param lines: Lines of user input
+    :type lines: list
+    :return: List of homepage URLs
+    """
+    seen = set()
+    domains = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if '://' not in line:
+            line = 'http://' + line
+        homepage = websiteDomain(line).lower()
+        if homepage.endswith('://') or homepage in seen:
+            continue
+        seen.add(homepage)
+        domains.append(homepage)
+    return domains
+
+
+def chunks(items, size):
+    """
+    :param items: List to split
+    :type items: list
+    :param size: Most items per chunk
+    :type size: int
+    :return: Generator of lists
+    """
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def reserve_dispatch(count, rate):
+    """
+    Book time for count crawls on the global dispatch schedule, shared by
+    every batch, so sites start no faster than rate per second however many
+    batches are submitted at once.
+
+    :param count: Crawls to dispatch
+    :type count: int
+    :param rate: Most crawls started per second
+    :type rate: float
+    :return: Seconds until the first of them may start
+    """
+    args = [int(time.time() * 1000), int(count * 1000 / rate)]
+    wait = redis_store.register_script(RESERVE_SCRIPT)(
+        keys=[DISPATCH_KEY], args=args)
+    return int(wait) / 1000.0
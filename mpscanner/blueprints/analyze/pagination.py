@@ -0,0 +1,90 @@
+import base64
+
+from bson import json_util
+from pymongo import ASCENDING
+
+
+def encode(value, _id):
+    """
+    Turn the sort key and _id of the last document on a page into an
+    opaque cursor for the next page.
+
+    :param value: Sort key of the document
+    :param _id: _id of the document
+    :return: URL safe str
+    """
+    raw = json_util.dumps([value, _id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode(cursor):
+    """
+    Read a cursor made by encode.
+
+    :param cursor: Cursor from a previous page
+    :type cursor: str
+    :return: Tuple of the sort key and _id, or None if the cursor is invalid
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        value, _id = json_util.loads(raw.decode('utf-8'))
+    except (TypeError, ValueError):
+        return None
+    return value, _id
+
+
+def paginate(collection, query, projection, key='_id', direction=ASCENDING,
+             after=None, limit=50):
+    """
+    Read one page of a query with keyset pagination: instead of skipping
+    the documents of earlier pages, continue from the sort key and _id of
+    the last document shown, so every page costs the same to read off an
+    index on the query fields, key and _id.
+
+    :param collection: Collection to read
+    :type collection: pymongo.collection.Collection
+    :param query: Filter selecting the documents
+    :type query: dict
+    :param projection: Fields to read, limited to what is shown
+    :type projection: dict
+    :param key: Field to sort by, ties are broken by _id
+    :type key: str
+    :param direction: ASCENDING or DESCENDING
+    :type direction: int
+    :param after: Cursor of the previous page or None for the first
+    :type after: str
+    :param limit: Most documents per page
+    :type limit: int
+    :return: Tuple of the documents and the next page's cursor or None
+    """
+    position = decode(after) if after else None
+    if position is not None:
+        value, _id = position
+        op = '$gt' if direction == ASCENDING else '$lt'
+        if key == '_id':
+            keyset = {'_id': {op: _id}}
+        else:
+            keyset = {'$or': [{key: {op: value}},
+                              {key: value, '_id': {op: _id}}]}
+        query = {'$and': [query, keyset]}
+    projection = dict(projection, **{key: 1})
+    order = [(key, direction)] if key == '_id' else \
+        [(key, direction), ('_id', direction)]
+    found = list(collection.find(query, projection).sort(order)
+                 .limit(limit + 1))
+    docs = found[:limit]
+    cursor = None
+    if len(found) > limit:
+        cursor = encode(docs[-1].get(key), docs[-1]['_id'])
+    return docs, cursor
+
+
+def serialize(docs):
+    """
+    Make documents safe to return as JSON.
+
+    :param docs: Documents read from Mongo
+    :type docs: list
+    :return: List of dicts with _id as a string
+    """
+    return [dict(doc, _id=str(doc['_id'])) for doc in docs]
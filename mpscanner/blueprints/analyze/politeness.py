@@ -0,0 +1,112 @@
+import math
+import time
+from urllib.parse import urlparse
+
+import requests
+
+from lib.potato.fetch import Fetcher
+from mpscanner.extensions import redis_store
+
+# Book the next free request slot for a host and say how long until it opens.
+# KEYS: the host's next allowed time in milliseconds
+# ARGV: now in milliseconds, delay between requests in milliseconds
+RESERVE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local delay = tonumber(ARGV[2])
+local slot = math.max(now, tonumber(redis.call('GET', KEYS[1]) or '0'))
+redis.call('SET', KEYS[1], slot + delay, 'PX', slot + delay - now + 60000)
+return slot - now
+"""
+
+
+def parse_crawl_delay(robots, agent='*'):
+    """
+    Read the Crawl-delay a robots.txt gives a user agent. Groups naming the
+    agent win over the wildcard group.
+
+    :param robots: Contents of a robots.txt file
+    :type robots: str
+    :param agent: User agent to look up
+    :type agent: str
+    :return: Delay in seconds or None
+    """
+    delays = {}
+    agents = []
+    in_rules = False
+    for line in robots.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        field, value = [part.strip() for part in line.split(':', 1)]
+        field = field.lower()
+        if field == 'user-agent':
+            if in_rules:
+                agents = []
+                in_rules = False
+            agents.append(value.lower())
+        else:
+            in_rules = True
+            if field == 'crawl-delay':
+                try:
+                    delay = float(value)
+                except ValueError:
+                    continue
+                if not math.isfinite(delay) or delay < 0:
+                    continue
+                for name in agents:
+                    delays.setdefault(name, delay)
+    return delays.get(agent.lower(), delays.get('*'))
+
+
+def crawl_delay(url, default=2, fetcher=None):
+    """
+    Seconds to wait between requests to a URL's host: the robots.txt
+    Crawl-delay when it asks for longer than the default. Each host's
+    robots.txt is fetched once a day and the answer kept in Redis.
+
+    :param url: Any URL on the host
+    :type url: str
+    :param default: Minimum delay in seconds
+    :type default: float
+    :param fetcher: Pooled fetcher to request robots.txt with
+    :type fetcher: lib.potato.fetch.Fetcher
+    :return: float
+    """
+    page = urlparse(url)
+    key = 'politeness:{0}:delay'.format(page.netloc)
+    cached = redis_store.get(key)
+    if cached is not None:
+        return max(float(cached), default)
+
+    delay = 0
+    robots = '{0}://{1}/robots.txt'.format(page.scheme, page.netloc)
+    fetcher = fetcher or Fetcher()
+    try:
+        r = fetcher.fetch(robots)
+        if r.status == 200:
+            delay = parse_crawl_delay(r.text) or 0
+    except requests.RequestException as e:
+        print(e, e.args, 'failed while fetching %s' % (robots))
+    redis_store.setex(key, 86400, delay)
+    return max(delay, default)
+
+
+def reserve(url, default=2, fetcher=None):
+    """
+    Book the next request slot for a URL's host, keeping requests to one
+    host at least its crawl delay apart across every worker.
+
+    :param url: URL about to be requested
+    :type url: str
+    :param default: Minimum delay in seconds
+    :type default: float
+    :param fetcher: Pooled fetcher to request robots.txt with
+    :type fetcher: lib.potato.fetch.Fetcher
+    :return: Seconds until the booked slot, to use as a task countdown
+    """
+    host = urlparse(url).netloc
+    delay = crawl_delay(url, default, fetcher)
+    keys = ['politeness:{0}:next'.format(host)]
+    args = [int(time.time() * 1000), int(delay * 1000)]
+    wait = redis_store.register_script(RESERVE_SCRIPT)(keys=keys, args=args)
+    return int(wait) / 1000.0
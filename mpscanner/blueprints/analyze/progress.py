@@ -0,0 +1,146 @@
+import json
+import time
+
+from mpscanner.extensions import redis_store
+
+COUNTERS = ('sites', 'sites_started', 'queued', 'fetching', 'fetched',
+            'extracting', 'parsed', 'unchanged', 'failed', 'stored', 'bytes',
+            'latency_ms')
+
+
+class BatchProgress(object):
+    """
+    Counters describing how far a batch of crawls has got, held in one
+    Redis hash that every worker updates as pages move from queued to
+    fetching, then to unchanged or extracting, from extracting to parsed,
+    and on to stored. A page can fail while fetching or extracting.
+    """
+
+    def __init__(self, batch_id, ttl=604800):
+        """
+        :param batch_id: Identifier of the batch
+        :type batch_id: str
+        :param ttl: Seconds the counters are kept after the last update
+        :type ttl: int
+        """
+        self.batch_id = batch_id
+        self.ttl = ttl
+        self.key = 'progress:{0}'.format(batch_id)
+
+    def update(self, **counts):
+        """
+        Add to counters in one round trip, doing nothing for crawls that
+        are not part of a batch.
+
+        :param counts: Counter names and the amounts to add
+        :return: None
+        """
+        if not self.batch_id:
+            return None
+        pipe = redis_store.pipeline()
+        for name, amount in counts.items():
+            pipe.hincrby(self.key, name, int(amount))
+        pipe.hset(self.key, 'updated', time.time())
+        pipe.expire(self.key, self.ttl)
+        pipe.execute()
+        return None
+
+    def submitted(self, sites):
+        """
+        :param sites: Number of sites sent off for crawling
+        :type sites: int
+        """
+        self.update(sites=sites)
+
+    def site_started(self):
+        self.update(sites_started=1)
+
+    def queued(self, pages):
+        """
+        :param pages: Number of pages handed to crawl_page tasks
+        :type pages: int
+        """
+        if pages:
+            self.update(queued=pages)
+
+    def fetching(self):
+        self.update(queued=-1, fetching=1)
+
+    def failed(self, extracting=False):
+        """
+        :param extracting: True if the page failed after it was fetched
+        :type extracting: bool
+        """
+        state = 'extracting' if extracting else 'fetching'
+        self.update(failed=1, **{state: -1})
+
+    def fetched(self, size, latency, unchanged=False):
+        """
+        Count a page fetched, which either reuses its last crawl's
+        extraction or waits to be extracted.
+
+        :param size: Bytes in the page body
+        :type size: int
+        :param latency: Seconds the fetch took
+        :type latency: float
+        :param unchanged: True if the last crawl's extraction is reused
+        :type unchanged: bool
+        :return: None
+        """
+        state = 'unchanged' if unchanged else 'extracting'
+        self.update(fetching=-1, fetched=1, bytes=size,
+                    latency_ms=latency * 1000, **{state: 1})
+
+    def parsed(self):
+        self.update(extracting=-1, parsed=1)
+
+    def stored(self):
+        self.update(stored=1)
+
+    def snapshot(self):
+        """
+        Read the counters of the batch.
+
+        :return: Dict of counters, the mean fetch latency in seconds and
+            whether every submitted site has started and no page is left
+            queued, fetching or extracting
+        """
+        raw = redis_store.hgetall(self.key)
+        data = {name: int(raw.get(name, 0)) for name in COUNTERS}
+        fetched = data['fetched']
+        latency = data.pop('latency_ms')
+        data['batch_id'] = self.batch_id
+        data['mean_latency'] = latency / 1000.0 / fetched if fetched else None
+        data['updated'] = float(raw['updated']) if 'updated' in raw else None
+        data['done'] = bool(raw) and \
+            data['sites_started'] >= data['sites'] and \
+            data['queued'] <= 0 and data['fetching'] <= 0 and \
+            data['extracting'] <= 0
+        return data
+
+    def events(self, interval=1.0, limit=20):
+        """
+        Server-sent events of the counters, sent whenever they change, with
+        a done event once the batch is finished. The stream ends after limit
+        seconds, within the web worker timeout, and the browser's
+        EventSource reconnects a second later.
+
+        :param interval: Seconds between reads of the counters
+        :type interval: float
+        :param limit: Most seconds one stream is kept open
+        :type limit: float
+        :return: Generator of event strings
+        """
+        started = time.time()
+        last = None
+        while time.time() - started < limit:
+            snapshot = self.snapshot()
+            if snapshot['done']:
+                yield 'event: done\ndata: {0}\n\n'.format(
+                    json.dumps(snapshot))
+                return
+            if snapshot != last:
+                yield 'data: {0}\n\n'.format(json.dumps(snapshot))
+                last = snapshot
+            time.sleep(interval)
+        yield 'retry: 1000\n\n'
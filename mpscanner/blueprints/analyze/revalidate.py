@@ -0,0 +1,107 @@
+import hashlib
+from datetime import datetime
+
+from pymongo.errors import DuplicateKeyError
+
+from mpscanner.extensions import mongo
+
+
+def digest(content):
+    """
+    Fingerprint a response body.
+
+    :param content: Response body
+    :type content: bytes
+    :return: Hex digest string
+    """
+    return hashlib.sha1(content).hexdigest()
+
+
+def lookup(url):
+    """
+    Find what was stored the last time a URL was crawled.
+
+    :param url: URL of the page
+    :type url: str
+    :return: Cached page document or None
+    """
+    return mongo.db.page_cache.find_one({'url': url})
+
+
+def conditional_headers(cached):
+    """
+    Build the request headers that let a server answer 304 Not Modified.
+
+    :param cached: Cached page document or None
+    :type cached: dict
+    :return: dict
+    """
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+    return headers
+
+
+def validators(result):
+    """
+    The response headers a server can later compare a request against.
+
+    :param result: The fetch of the page
+    :type result: lib.potato.fetch.FetchResult
+    :return: dict of etag and last_modified
+    """
+    return {'etag': result.headers.get('ETag'),
+            'last_modified': result.headers.get('Last-Modified')}
+
+
+def unchanged(cached, result, body_hash):
+    """
+    Decide if a page can reuse its cached extraction: the server answered
+    304, or the body hashes the same as last time.
+
+    :param cached: Cached page document or None
+    :type cached: dict
+    :param result: The fetch of the page
+    :type result: lib.potato.fetch.FetchResult
+    :param body_hash: Digest of the fetched body
+    :type body_hash: str
+    :return: bool
+    """
+    if not cached or 'crawl_data' not in cached:
+        return False
+    return result.status == 304 or cached.get('hash') == body_hash
+
+
+def store(url, page_validators, body_hash, crawl_data, links):
+    """
+    Remember a page's validators, body hash, extraction and internal links
+    for the next crawl. Two crawls of the same URL can race to insert it,
+    in which case the loser's upsert is retried as an update.
+
+    :param url: URL of the page
+    :type url: str
+    :param page_validators: The page's validators
+    :type page_validators: dict
+    :param body_hash: Digest of the fetched body
+    :type body_hash: str
+    :param crawl_data: Data extracted from the page
+    :type crawl_data: dict
+    :param links: Internal links found on the page
+    :type links: list
+    :return: None
+    """
+    update = {'$set': {'etag': page_validators.get('etag'),
+                       'last_modified': page_validators.get('last_modified'),
+                       'hash': body_hash,
+                       'crawl_data': crawl_data,
+                       'links': links,
+                       'updated': datetime.now()}}
+    try:
+        mongo.db.page_cache.update_one({'url': url}, update, upsert=True)
+    except DuplicateKeyError:
+        # Another crawl inserted the URL first, update its document
+        mongo.db.page_cache.update_one({'url': url}, update, upsert=True)
+    return None
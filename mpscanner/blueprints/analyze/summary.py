@@ -0,0 +1,103 @@
+from pymongo import UpdateOne
+
+# Counters kept on every summary: the field that is added up and how a
+# page's crawl_data contributes to it
+COUNTERS = {
+    'pages': lambda data: 1,
+    'words': lambda data: data.get('content_count') or 0,
+    'bytes': lambda data: data.get('page_size_in_bytes') or 0,
+    'missing_title': lambda data: int(not data.get('title_length')),
+    'missing_meta': lambda data: int(not data.get('metaDesc_length')),
+    'missing_h1': lambda data: int(not data.get('h1_length')),
+    'hreflang_pages': lambda data: int(bool(data.get('hreflangOnPage'))),
+}
+
+
+def summaries(doc):
+    """
+    The summaries a scan document counts towards: its site, and its batch
+    when it belongs to one.
+
+    :param doc: Scan document
+    :type doc: dict
+    :return: List of (kind, key, fields) tuples
+    """
+    found = [('site', doc['uuid'], {'homepage': doc['homepage']})]
+    if doc.get('batch_id'):
+        found.append(('batch', doc['batch_id'], {}))
+    return found
+
+
+def summarize(docs):
+    """
+    Fold scan documents into one update per summary they touch.
+
+    :param docs: Scan documents
+    :type docs: list
+    :return: List of UpdateOne upserts
+    """
+    updates = {}
+    for doc in docs:
+        data = doc.get('crawl_data') or {}
+        for kind, key, fields in summaries(doc):
+            update = updates.get((kind, key))
+            if update is None:
+                update = updates[(kind, key)] = {
+                    '$inc': dict.fromkeys(COUNTERS, 0),
+                    '$min': {'first_crawl': doc['crawl_time']},
+                    '$max': {'last_crawl': doc['crawl_time']}}
+                # Mongo before 5.0 rejects an empty $set
+                if fields:
+                    update['$set'] = fields
+            for name, count in COUNTERS.items():
+                update['$inc'][name] += count(data)
+            update['$min']['first_crawl'] = min(
+                update['$min']['first_crawl'], doc['crawl_time'])
+            update['$max']['last_crawl'] = max(
+                update['$max']['last_crawl'], doc['crawl_time'])
+    return [UpdateOne({'kind': kind, 'key': key}, update, upsert=True)
+            for (kind, key), update in updates.items()]
+
+
+def record_pages(db, docs):
+    """
+    Add newly written scan documents to the site and batch summaries. Call
+    it once per document inserted, not for rewrites of a stored page, or
+    the page is counted twice.
+
+    :param db: Mongo database
+    :type db: pymongo.database.Database
+    :param docs: Scan documents that were inserted
+    :type docs: list
+    :return: None
+    """
+    updates = summarize(docs)
+    if updates:
+        db.scan_summary.bulk_write(updates, ordered=False)
+    return None
+
+
+def rebuild(db, batch_size=1000):
+    """
+    Recompute every summary from the scan collection, for data written
+    before summaries were kept.
+
+    :param db: Mongo database
+    :type db: pymongo.database.Database
+    :param batch_size: Scan documents folded per write
+    :type batch_size: int
+    :return: Number of scan documents summarized
+    """
+    db.scan_summary.delete_many({})
+    fields = {'crawl_data': 1, 'crawl_time': 1, 'uuid': 1, 'homepage': 1,
+              'batch_id': 1}
+    docs = []
+    total = 0
+    for doc in db.scan.find({}, fields, batch_size=batch_size):
+        docs.append(doc)
+        if len(docs) == batch_size:
+            record_pages(db, docs)
+            total += len(docs)
+            docs = []
+    record_pages(db, docs)
+    return total + len(docs)
@@ -1,43 +1,346 @@
-import time
-import uuid
-import random
 import requests
 from datetime import datetime
+from celery import group
+from celery.signals import (
+    worker_process_shutdown,
+    worker_ready,
+    worker_shutdown)
 from mpscanner.extensions import mongo
 from lib.potato.onpage import PageParse
-from lib.potato.extract import websiteDomain, webpageData
+from lib.potato.document import Document
+from lib.potato.extract import webpageData
+from lib.potato.lang import LanguageDetector
+from lib.potato.fetch import Fetcher, FetchResult, HTML_TYPES
+from lib.potato import urls
 from mpscanner.app import create_celery_app
+from mpscanner.blueprints.analyze.frontier import Frontier
+from mpscanner.blueprints.analyze import (
+    blobs,
+    ingest,
+    politeness,
+    revalidate,
+    summary)
+from mpscanner.blueprints.analyze.writer import ResultWriter
+from mpscanner.blueprints.analyze.progress import BatchProgress
+from mpscanner.blueprints.analyze.indexes import ensure_indexes
 
 celery = create_celery_app()
+# One detector per worker process so its cache spans every page crawled
+detector = LanguageDetector(
+    celery.conf.get('POTATO_LANG_BACKEND') or 'langdetect',
+    celery.conf.get('POTATO_LANG_CACHE_SIZE') or 10000)
+# Pooled keep-alive connections shared by every page this process fetches
+fetcher = Fetcher(
+    timeout=celery.conf.get('FETCH_TIMEOUT') or 5,
+    retries=celery.conf.get('FETCH_RETRIES') or 2,
+    maxBytes=celery.conf.get('FETCH_MAX_BYTES') or 5 * 1024 * 1024)
+# Bodies past this size, or cut off at the fetch cap, are parsed head-only
+full_parse_bytes = celery.conf.get('POTATO_FULL_PARSE_BYTES') or 1024 * 1024
+head_only_body_chars = celery.conf.get('POTATO_HEAD_ONLY_BODY_CHARS') or 65536
+# Readability, vocabulary and top terms cost an extra pass over page text
+content_stats = bool(celery.conf.get('POTATO_CONTENT_STATS'))
+# Page documents are written to Mongo in batches, and new ones are added to
+# their site and batch report summaries
+writer = ResultWriter(
+    max_docs=celery.conf.get('SCAN_WRITE_BATCH') or 100,
+    max_age=celery.conf.get('SCAN_WRITE_INTERVAL') or 5,
+    on_insert=summary.record_pages)
+# (seed, page) task priorities per queue, Redis serves 0 first. Bulk pages
+# of sites already started go before new seeds, so a batch finishes the
+# sites it has opened instead of opening them all at once.
+CRAWL_PRIORITIES = {'interactive': (0, 0), 'bulk': (6, 3)}
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_results(**kwargs):
+    """
+    Write any buffered page documents before the worker process exits, or
+    the worker itself when it runs tasks on threads.
+
+    :return: None
+    """
+    writer.flush()
+    return None
+
+
+@celery.task()
+def ensure_scan_indexes():
+    """
+    Create the indexes the reports and crawler rely on.
+
+    :return: None
+    """
+    ensure_indexes(mongo.db)
+    return None
+
+
+@worker_ready.connect
+def create_indexes(**kwargs):
+    """
+    Ensure indexes once when a worker starts, before it takes any crawls.
+
+    :return: None
+    """
+    ensure_scan_indexes()
+    return None
+
+
+@celery.task()
+def submit_batch(batch_id, lines):
+    """
+    Start crawling a pasted list of sites. Sites are normalized and
+    deduplicated, then published in chunks as Celery groups, each booked on
+    the global dispatch schedule so crawls start at CRAWL_SUBMIT_RATE sites
+    a second at most.
+
+    :param batch_id: Batch the crawls belong to
+    :type batch_id: str
+    :param lines: Lines of user input, one site per line
+    :type lines: list
+    :return: Number of sites submitted
+    """
+    domains = ingest.normalize_domains(lines)
+    size = celery.conf.get('CRAWL_SUBMIT_CHUNK') or 100
+    rate = float(celery.conf.get('CRAWL_SUBMIT_RATE') or 10)
+    BatchProgress(batch_id).submitted(len(domains))
+    for chunk in ingest.chunks(domains, size):
+        start = ingest.reserve_dispatch(len(chunk), rate)
+        group(crawl.signature((domain,), {'batch_id': batch_id,
+                                          'queue': 'bulk'},
+                              queue='bulk',
+                              priority=CRAWL_PRIORITIES['bulk'][0],
+                              countdown=start + i / rate)
+              for i, domain in enumerate(chunk)).apply_async()
+    return len(domains)
 
 
 @celery.task(bind=True)
-def crawl(self, url, batch_id=None):
+def crawl(self, url, batch_id=None, queue='interactive'):
+    """
+    Start crawling a site. The seed URL goes into a new frontier and pages
+    are then fetched by independent crawl_page tasks.
+
+    :param url: Seed URL of the site
+    :type url: str
+    :param batch_id: Batch the crawl belongs to
+    :type batch_id: str
+    :param queue: interactive or bulk, where the site's pages are fetched
+    :type queue: str
+    :return: Identifier of the crawl
+    """
     if batch_id is None:
         batch_id = ''
-    webData = mongo.db.scan
-    homepage = websiteDomain(url)
-    r = requests.get(url, timeout=5)
-    siteData = webpageData(r.text, url, 'prospect', url)
-    webData.insert_one(
-        {
-            'crawl_data': siteData,
-            'crawl_time': datetime.now(),
-            'homepage': homepage,
-            'uuid': str(uuid.uuid3(uuid.NAMESPACE_DNS, homepage)),
-            'batch_id': batch_id
-        })
-
-    # Restrict crawling to only internal links on same domain
-    page = PageParse(r.text, url)
-    links = page.hrefs()
-    domain_links = [x for x in links if websiteDomain(x) ==
-                    websiteDomain(url)]
-    nextlinks = random.sample(domain_links, 2)
-
-    for link in nextlinks:
-        time.sleep(random.randint(2, 5))
-        if webData.find({'homepage': homepage}).count() < 10:
-            time.sleep(random.randint(2, 5))
-            crawl(link, batch_id=batch_id)
+    url = urls.normalize(url) or url
+    frontier = Frontier.create(
+        url, batch_id,
+        budget=celery.conf.get('CRAWL_PAGE_BUDGET') or 10,
+        max_depth=celery.conf.get('CRAWL_MAX_DEPTH') or 3,
+        queue=queue)
+    BatchProgress(batch_id).site_started()
+    frontier.add([url], 0)
+    schedule(frontier, 1)
+    return frontier.crawl_id
+
+
+@celery.task(bind=True)
+def crawl_page(self, crawl_id, url, depth):
+    """
+    Fetch one page of a crawl and hand its body to an extract_page task.
+    Fetches only wait on the network, so they run on a thread pool while
+    extraction gets a process per core. Pages unchanged since the last
+    crawl reuse its extraction and are stored here, and responses that are
+    not HTML are not read.
+
+    :param crawl_id: Identifier of the crawl
+    :type crawl_id: str
+    :param url: URL of the page
+    :type url: str
+    :param depth: Number of links followed from the seed URL
+    :type depth: int
+    :return: None
+    """
+    frontier = Frontier(crawl_id)
+    progress = BatchProgress(frontier.batch_id)
+    progress.fetching()
+    cached = revalidate.lookup(url)
+    try:
+        r = fetcher.fetch(url, revalidate.conditional_headers(cached),
+                          types=HTML_TYPES)
+    except requests.RequestException as e:
+        print(e, e.args, 'failed while fetching %s' % (url))
+        progress.failed()
+        schedule(frontier)
+        return None
+    if r.rejected:
+        print('skipped %s, not an HTML page: %s' % (url, r.contentType))
+        progress.failed()
+        schedule(frontier)
+        return None
+
+    body_hash = revalidate.digest(r.content)
+    if revalidate.unchanged(cached, r, body_hash):
+        # Nothing changed since the last crawl, reuse its extraction
+        if r.status != 304:
+            revalidate.store(url, revalidate.validators(r), body_hash,
+                             cached['crawl_data'], cached.get('links', []))
+        progress.fetched(len(r.content), r.elapsed, True)
+        store_page(frontier, progress, url, depth, cached['crawl_data'],
+                   cached.get('links', []))
+        return None
+
+    fetched = {'url': r.url, 'status': r.status, 'encoding': r.encoding,
+               'elapsed': r.elapsed, 'truncated': r.truncated,
+               'hash': body_hash, 'validators': revalidate.validators(r)}
+    blob = blobs.put(r.content, celery.conf.get('CRAWL_BLOB_TTL') or 3600)
+    progress.fetched(len(r.content), r.elapsed)
+    extract_page.apply_async(
+        (crawl_id, url, depth, blob, fetched), queue='extract',
+        priority=CRAWL_PRIORITIES.get(frontier.queue, (0, 0))[1])
+    return None
+
+
+@celery.task()
+def extract_page(crawl_id, url, depth, blob, fetched):
+    """
+    Extract and store a page fetched by crawl_page, then queue its internal
+    links and schedule the next pages from the frontier. Pages too big to
+    parse whole are parsed head-only.
+
+    :param crawl_id: Identifier of the crawl
+    :type crawl_id: str
+    :param url: URL of the page
+    :type url: str
+    :param depth: Number of links followed from the seed URL
+    :type depth: int
+    :param blob: Key of the page body in the blob store
+    :type blob: str
+    :param fetched: Response details: final url, status, encoding,
+        elapsed, truncated, body hash and validators
+    :type fetched: dict
+    :return: None
+    """
+    frontier = Frontier(crawl_id)
+    progress = BatchProgress(frontier.batch_id)
+    content = blobs.get(blob)
+    if content is None:
+        print('body of %s expired before it was extracted' % (url))
+        progress.failed(extracting=True)
+        schedule(frontier)
+        return None
+    r = FetchResult(fetched['url'], fetched['status'], {}, content,
+                    fetched['encoding'], fetched['elapsed'],
+                    fetched['truncated'])
+
+    try:
+        # Parse once and share the tree between extraction and link
+        # discovery
+        body_chars = None
+        if r.truncated or len(r.content) > full_parse_bytes:
+            body_chars = head_only_body_chars
+        document = Document(r.text, url, celery.conf.get('POTATO_PARSER'),
+                            body_chars)
+        siteData = webpageData(document, url, 'prospect', url,
+                               stats=content_stats, detector=detector,
+                               size=len(r.content))
+        # Restrict crawling to only internal links on the same site. Links
+        # resolve against, and are compared with, where the page ended up
+        # after any redirect.
+        page = PageParse(document, r.url or url)
+        domain_links = urls.internal(urls.discover(page), r.url or url)
+        canonical = urls.canonical(page)
+    except (Exception, SystemExit) as e:
+        # A page that cannot be extracted must not stall its crawl
+        print(e, e.args, 'failed while extracting %s' % (url))
+        blobs.discard(blob)
+        progress.failed(extracting=True)
+        schedule(frontier)
+        return None
+    blobs.discard(blob)
+    # The page's canonical and redirected URLs are this page, not new ones
+    frontier.mark_seen([x for x in (canonical, urls.normalize(r.url or url))
+                        if x and x != url])
+    revalidate.store(url, fetched['validators'], fetched['hash'], siteData,
+                     domain_links)
+    progress.parsed()
+    store_page(frontier, progress, url, depth, siteData, domain_links)
+    return None
+
+
+def store_page(frontier, progress, url, depth, siteData, domain_links):
+    """
+    Write a page's extraction, queue its internal links and schedule the
+    next pages of the crawl.
+
+    :param frontier: Crawl state of the site
+    :type frontier: Frontier
+    :param progress: Counters of the crawl's batch
+    :type progress: BatchProgress
+    :param url: URL of the page
+    :type url: str
+    :param depth: Number of links followed from the seed URL
+    :type depth: int
+    :param siteData: Data extracted from the page
+    :type siteData: dict
+    :param domain_links: Internal links found on the page
+    :type domain_links: list
+    :return: None
+    """
+    def stored():
+        # Counted once the buffered write has reached Mongo
+        frontier.page_stored()
+        progress.stored()
+
+    key = {'url': url, 'batch_id': frontier.batch_id,
+           'crawl_id': frontier.crawl_id}
+    writer.write(mongo.db.scan, key,
+                 frontier.scan_document(url, siteData, datetime.now()),
+                 stored)
+    frontier.add(domain_links, depth + 1)
+    schedule(frontier)
+    return None
+
+
+def schedule(frontier, fanout=None):
+    """
+    Hand the next pages of a crawl to crawl_page tasks. Each page books its
+    host's next politeness slot and is queued with a countdown until then,
+    so no worker sleeps between requests. Pages go to the queue the crawl
+    came in on.
+
+    :param frontier: Crawl state of the site
+    :type frontier: Frontier
+    :param fanout: Most pages to schedule, CRAWL_FANOUT by default
+    :type fanout: int
+    :return: None
+    """
+    fanout = fanout or celery.conf.get('CRAWL_FANOUT') or 2
+    default_delay = celery.conf.get('CRAWL_DELAY') or 2
+    queue = frontier.queue
+    page_priority = CRAWL_PRIORITIES.get(queue, (0, 0))[1]
+    pages = frontier.pop(fanout)
+    BatchProgress(frontier.batch_id).queued(len(pages))
+    for url, depth in pages:
+        countdown = politeness.reserve(url, default_delay, fetcher)
+        crawl_page.apply_async((frontier.crawl_id, url, depth),
+                               countdown=countdown, queue=queue,
+                               priority=page_priority)
     return None
+
+
+@celery.task()
+def sitemap_links(url):
+    """
+    Find a site's XML sitemaps and count the URLs they list. Sitemap walks
+    run on their own queue since large sitemaps take minutes.
+
+    :param url: Any URL on the site
+    :type url: str
+    :return: Dict of the sitemaps found and the number of URLs in them
+    """
+    from lib.potato.sitemap import findSitemap, SitemapWalker
+
+    walker = SitemapWalker(fetcher=fetcher)
+    sitemaps = findSitemap(url, walker)
+    links = walker.walk(sitemaps)[0] if sitemaps else 0
+    return {'sitemaps': sitemaps, 'links': links}
@@ -3,71 +3,130 @@ from flask import (
     url_for,
     render_template,
     redirect,
-    make_response,
+    Response,
+    current_app,
+    stream_with_context,
+    abort,
+    request,
+    jsonify,
     flash)
 from mpscanner.blueprints.analyze.forms import CrawlForm, BulkCrawlForm
 from mpscanner.extensions import mongo
+from mpscanner.blueprints.analyze import export as exports
+from mpscanner.blueprints.analyze.pagination import paginate, serialize
+from mpscanner.blueprints.analyze.progress import BatchProgress
 from lib.potato.extract import name, websiteDomain
-import pandas as pd
+from pymongo import DESCENDING
 import uuid
 
 analyze = Blueprint('analyze', __name__, template_folder='templates')
 
+PER_PAGE = 50
+SUMMARY_FIELDS = {'key': 1, 'homepage': 1, 'pages': 1, 'last_crawl': 1}
+PAGE_FIELDS = {'url': 1, 'crawl_time': 1, 'uuid': 1,
+               'crawl_data.title': 1, 'crawl_data.content_count': 1}
+TRANSLATION_FIELDS = {'domain_name': 1, 'website': 1, 'title': 1,
+                      'title_lang': 1, 'metaDesc': 1, 'meta_lang': 1,
+                      'htmlLang': 1}
+
+
+def wants_json():
+    """
+    Report views answer with JSON when asked for it with ?format=json or an
+    Accept header preferring it, so templates can load further pages.
+
+    :return: bool
+    """
+    return request.args.get('format') == 'json' or \
+        request.accept_mimetypes.best == 'application/json'
+
+
+def page_json(**pages):
+    """
+    :param pages: Name to (documents, next cursor) tuples
+    :return: JSON response of each page's items and next cursor
+    """
+    return jsonify({key: {'items': serialize(docs), 'next': cursor}
+                    for key, (docs, cursor) in pages.items()})
+
 
 @analyze.route('/analyze/bulk', methods=['GET', 'POST'])
 def bulk():
     form = BulkCrawlForm()
     if form.validate_on_submit():
-        from mpscanner.blueprints.analyze.tasks import crawl
+        from mpscanner.blueprints.analyze.tasks import submit_batch
         urlgroup = str(form.websites.data).splitlines()
         batch_id = str(uuid.uuid1())
-        for domain in urlgroup:
-            crawl.delay(domain, batch_id=batch_id)
+        submit_batch.delay(batch_id, urlgroup)
         flash('Domains sent off for analysis~!', 'success')
-        return render_template('analyze/bulk.html', form=form)
+        return render_template('analyze/bulk.html', form=form,
+                               batch_id=batch_id)
     else:
         return render_template('analyze/bulk.html', form=form)
 
 
-@analyze.route('/newreport/<job_id>/<report>/download')
-def export(job_id, report):
+@analyze.route('/analyze/bulk/<batch_id>/progress')
+def batchProgress(batch_id):
+    return jsonify(BatchProgress(batch_id).snapshot())
+
+
+@analyze.route('/analyze/bulk/<batch_id>/progress/stream')
+def batchProgressStream(batch_id):
+    events = BatchProgress(batch_id).events(
+        limit=current_app.config.get('PROGRESS_STREAM_SECONDS', 20))
+    response = Response(stream_with_context(events),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@analyze.route('/newreport/<job_id>/<report>/download',
+               defaults={'fmt': 'csv'})
+@analyze.route('/newreport/<job_id>/<report>/download/<fmt>')
+def export(job_id, report, fmt):
+    if not exports.available(fmt):
+        abort(404)
+    mimetype, filename, rows = exports.FORMATS[fmt][:3]
     pageData = mongo.db.scan
-    data = []
     if report == 'domain':
-        for d in pageData.find({'uuid': job_id}):
-            data.append(d['crawl_data'])
+        query = {'uuid': job_id}
     elif report == 'batch':
-        for d in pageData.find({'batch_id': job_id}):
-            data.append(d['crawl_data'])
-    df = pd.DataFrame(data)
-    response = make_response(df.to_csv())
-    response.headers['Content-Disposition'] = 'attachment; filename=export.csv'
-    response.headers['Content-Type'] = 'text/csv'
+        query = {'batch_id': job_id}
+    else:
+        query = {'_id': None}
+    response = Response(stream_with_context(rows(pageData, query)),
+                        mimetype=mimetype)
+    response.headers['Content-Disposition'] = \
+        'attachment; filename={0}'.format(filename)
     return response
 
 
 @analyze.route('/newreports')
 def scanReport():
-    webData = mongo.db.scan
-    data = []
-    batch = []
-    crawls = webData.aggregate(
-        [{'$group': {'_id': {'homepage': '$homepage', 'uuid': '$uuid'}}}])
-    batch_crawls = webData.distinct('batch_id')
-    for d in crawls:
-        data.append(d)
-    for d in batch_crawls:
-        batch.append(d)
-    return render_template('analyze/new_reports.html', sites=data, batch=batch)
+    summaries = mongo.db.scan_summary
+    sites = paginate(summaries, {'kind': 'site'}, SUMMARY_FIELDS,
+                     key='last_crawl', direction=DESCENDING,
+                     after=request.args.get('sites'), limit=PER_PAGE)
+    batch = paginate(summaries, {'kind': 'batch'}, SUMMARY_FIELDS,
+                     key='last_crawl', direction=DESCENDING,
+                     after=request.args.get('batches'), limit=PER_PAGE)
+    if wants_json():
+        return page_json(sites=sites, batch=batch)
+    return render_template('analyze/new_reports.html', sites=sites[0],
+                           batch=batch[0], next_sites=sites[1],
+                           next_batches=batch[1])
 
 
 @analyze.route('/newreports/<site_id>')
 def siteScanReport(site_id):
     pageData = mongo.db.scan
-    data = []
-    for d in pageData.find({'uuid': site_id}):
-        data.append(d)
-    return render_template('analyze/new_single_report.html', sites=data)
+    pages = paginate(pageData, {'uuid': site_id}, PAGE_FIELDS,
+                     after=request.args.get('after'), limit=PER_PAGE)
+    if wants_json():
+        return page_json(pages=pages)
+    return render_template('analyze/new_single_report.html', site_id=site_id,
+                           sites=pages[0], next_page=pages[1])
 
 
 @analyze.route('/analyze', methods=['GET', 'POST'])
@@ -104,12 +163,14 @@ def sitestatus(task_id):
 @analyze.route('/reports')
 def reporting():
     onelink = mongo.db.onelink
-    data = []
-    for d in onelink.find():
-        company = d['domain_name']
-        data.append(company)
-    data.sort()
-    return render_template('analyze/reports.html', data=data)
+    companies = paginate(onelink, {}, {'domain_name': 1},
+                         key='domain_name', after=request.args.get('after'),
+                         limit=PER_PAGE * 2)
+    if wants_json():
+        return page_json(companies=companies)
+    data = [d['domain_name'] for d in companies[0]]
+    return render_template('analyze/reports.html', data=data,
+                           next_page=companies[1])
 
 
 @analyze.route('/reports/<client>')
@@ -122,11 +183,12 @@ def analysis(client):
 @analyze.route('/reports/<client>/translation')
 def translation(client):
     company = mongo.db.trans
-    data = []
-    results = company.find({'domain_name': client})
-    for r in results:
-        data.append(r)
-    return render_template('analyze/translation.html', data=data)
+    results = paginate(company, {'domain_name': client}, TRANSLATION_FIELDS,
+                       after=request.args.get('after'), limit=PER_PAGE)
+    if wants_json():
+        return page_json(pages=results)
+    return render_template('analyze/translation.html', data=results[0],
+                           client=client, next_page=results[1])
 
 
 @analyze.route('/reports/<client>/seo')
@@ -0,0 +1,152 @@
+import threading
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+
+class ResultWriter(object):
+    """
+    Buffer page documents and write them to Mongo as one unordered
+    bulk_write of upserts. The buffer is flushed once it holds max_docs
+    documents or its oldest document has waited max_age seconds, whichever
+    comes first. Upserting on a key means a retried task rewrites its page
+    instead of duplicating it, and on_insert is only told about documents
+    that were new. A flush that fails without writing anything keeps its
+    documents for the next flush, and a document's on_write callback runs
+    only once it has been written.
+    """
+
+    def __init__(self, max_docs=100, max_age=5.0, on_insert=None):
+        """
+        :param max_docs: Documents to buffer before flushing
+        :type max_docs: int
+        :param max_age: Seconds a buffered document may wait
+        :type max_age: float
+        :param on_insert: Called with the database and the list of
+            documents a flush inserted
+        :type on_insert: callable
+        """
+        self.max_docs = max_docs
+        self.max_age = max_age
+        self.on_insert = on_insert
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.docs = []
+        self.callbacks = []
+        self.collection = None
+        self.timer = None
+
+    def write(self, collection, key, doc, on_write=None):
+        """
+        Buffer a document, flushing if the buffer is full.
+
+        :param collection: Collection to write to
+        :type collection: pymongo.collection.Collection
+        :param key: Filter identifying the document to replace
+        :type key: dict
+        :param doc: Document fields to set
+        :type doc: dict
+        :param on_write: Called once the document has been written
+        :type on_write: callable
+        :return: None
+        """
+        with self.lock:
+            if self.collection is not None and \
+                    self.collection.full_name != collection.full_name:
+                raise ValueError('A ResultWriter writes to one collection')
+            self.collection = collection
+            self.buffer.append(UpdateOne(key, {'$set': doc}, upsert=True))
+            self.docs.append(doc)
+            self.callbacks.append(on_write)
+            full = len(self.buffer) >= self.max_docs
+            if not full:
+                self.start_timer()
+        if full:
+            self.flush()
+        return None
+
+    def start_timer(self):
+        """
+        Schedule a flush after max_age, unless one is already scheduled.
+        Call it holding the lock.
+
+        :return: None
+        """
+        if self.timer is None:
+            self.timer = threading.Timer(self.max_age, self.flush_later)
+            self.timer.daemon = True
+            self.timer.start()
+        return None
+
+    def flush(self):
+        """
+        Write every buffered document. Documents the server rejects are
+        dropped and the error raised, other errors put every document back
+        in the buffer before they are raised.
+
+        :return: Number of documents written
+        """
+        with self.lock:
+            ops, self.buffer = self.buffer, []
+            docs, self.docs = self.docs, []
+            callbacks, self.callbacks = self.callbacks, []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            collection = self.collection
+        if not ops:
+            return 0
+        try:
+            result = collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            failed = {error['index']
+                      for error in e.details.get('writeErrors', [])}
+            upserted = [u['index'] for u in e.details.get('upserted', [])]
+            self.written(collection, docs, callbacks, upserted, failed)
+            raise
+        except PyMongoError:
+            with self.lock:
+                self.buffer[:0] = ops
+                self.docs[:0] = docs
+                self.callbacks[:0] = callbacks
+                self.start_timer()
+            raise
+        self.written(collection, docs, callbacks,
+                     list(result.upserted_ids), set())
+        return len(ops)
+
+    def written(self, collection, docs, callbacks, upserted, failed):
+        """
+        Tell on_insert and the documents' callbacks about a flush.
+
+        :param collection: Collection written to
+        :type collection: pymongo.collection.Collection
+        :param docs: Documents of the flush
+        :type docs: list
+        :param callbacks: on_write callbacks of the documents, or None
+        :type callbacks: list
+        :param upserted: Positions of the documents that were inserted
+        :type upserted: list
+        :param failed: Positions of the documents that were not written
+        :type failed: set
+        :return: None
+        """
+        if self.on_insert is not None and upserted:
+            self.on_insert(collection.database,
+                           [docs[i] for i in sorted(upserted)])
+        for i, on_write in enumerate(callbacks):
+            if on_write is not None and i not in failed:
+                on_write()
+        return None
+
+    def flush_later(self):
+        """
+        Flush from the timer thread, where there is no task to fail.
+
+        :return: None
+        """
+        try:
+            self.flush()
+        except Exception as e:
+            print(e, e.args, 'failed while flushing crawl results')
+        return None
@@ -2,8 +2,10 @@ from flask_debugtoolbar import DebugToolbarExtension
 from flask_mail import Mail
 from flask_wtf import CsrfProtect
 from flask_pymongo import PyMongo
+from flask_redis import FlaskRedis
 
 debug_toolbar = DebugToolbarExtension()
 mail = Mail()
 csrf = CsrfProtect()
 mongo = PyMongo()
+redis_store = FlaskRedis(decode_responses=True)
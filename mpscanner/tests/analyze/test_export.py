@@ -0,0 +1,88 @@
+import gzip
+import json
+
+import pytest
+
+from mpscanner.extensions import mongo
+from mpscanner.blueprints.analyze.export import (
+    csvRows,
+    columnarRows,
+    ndjsonRows)
+
+
+@pytest.fixture(scope='module')
+def scan(app):
+    """
+    A scan collection holding one batch of pages with uneven crawl_data.
+
+    :param app: Pytest fixture
+    :return: Mongo collection
+    """
+    collection = mongo.db.scan
+    collection.insert_many([
+        {'batch_id': 'export-batch', 'test_fixture': True,
+         'crawl_data': {'title': 'Shoes, boots', 'h1_length': 1,
+                        'missingImgAlts': 0.5,
+                        'hreflangValues': [{'hreflang': 'en'}]}},
+        {'batch_id': 'export-batch', 'test_fixture': True,
+         'crawl_data': {'title': None, 'missingImgAlts': 1}},
+        {'batch_id': 'export-legacy', 'test_fixture': True,
+         'crawl_data': {'title': 'New'}},
+        {'batch_id': 'export-legacy', 'test_fixture': True,
+         'crawl_data': {'title': 'Old', 'old_count': 2}}])
+    yield collection
+    collection.delete_many({'test_fixture': True})
+
+
+class TestExport(object):
+    def test_rows_match_the_dataframe_export(self, scan):
+        """ Columns are sorted, gaps are empty and gappy ints are floats. """
+        text = ''.join(csvRows(scan, {'batch_id': 'export-batch'}, rows=1))
+        assert text == (
+            ',h1_length,hreflangValues,missingImgAlts,title\n'
+            "0,1.0,[{'hreflang': 'en'}],0.5,\"Shoes, boots\"\n"
+            '1,,,1.0,\n')
+
+    def test_keys_of_any_page_are_columns(self, scan):
+        """ A key held by a later page only, as older crawls may have, is
+        still a column. """
+        text = ''.join(csvRows(scan, {'batch_id': 'export-legacy'}))
+        assert text == ',old_count,title\n0,,New\n1,2.0,Old\n'
+
+    @pytest.mark.parametrize('batch_id', ['export-batch', 'export-legacy'])
+    def test_output_matches_the_dataframe_export(self, scan, batch_id):
+        """ Header and rows are the ones DataFrame.to_csv wrote. """
+        pd = pytest.importorskip('pandas')
+        query = {'batch_id': batch_id}
+        data = [d['crawl_data'] for d in scan.find(query)]
+        # pandas 0.19 sorted the columns of a frame built from dicts, later
+        # releases keep insertion order
+        expected = pd.DataFrame(data).sort_index(axis=1).to_csv()
+        assert ''.join(csvRows(scan, query)) == expected
+
+    def test_download_streams_csv(self, client, scan):
+        """ The batch download responds with the streamed CSV. """
+        response = client.get('/newreport/export-batch/batch/download')
+        assert response.mimetype == 'text/csv'
+        assert response.data.startswith(b',h1_length,')
+
+    def test_ndjson_records_follow_the_schema(self, scan):
+        """ Every field is present and loose values are typed. """
+        data = b''.join(ndjsonRows(scan, {'batch_id': 'export-batch'}))
+        lines = gzip.decompress(data).decode('utf-8').splitlines()
+        first, second = [json.loads(line) for line in lines]
+        assert first['hreflangValues'] == [{'hreflang': 'en', 'loc': None}]
+        assert first['h1_length'] == 1
+        assert second['h1_length'] is None
+        assert second['hreflangValues'] == []
+        assert second['missingImgAlts'] == 1.0
+
+    def test_parquet_reads_back(self, scan):
+        """ The streamed Parquet file holds every page in one table. """
+        pa = pytest.importorskip('pyarrow')
+        pq = pytest.importorskip('pyarrow.parquet')
+        data = b''.join(columnarRows(scan, {'batch_id': 'export-batch'},
+                                     'parquet', batch_size=1))
+        table = pq.read_table(pa.BufferReader(data))
+        assert table.num_rows == 2
+        assert table.column('title').to_pylist() == ['Shoes, boots', None]
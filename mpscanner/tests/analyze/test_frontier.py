@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from mpscanner.blueprints.analyze.frontier import Frontier, priority
+
+
+class TestFrontier(object):
+    def test_urls_are_queued_once(self, redis):
+        """ The add script skips URLs already queued or marked seen. """
+        frontier = Frontier.create('http://acme.com/', budget=10)
+        assert frontier.add(['http://acme.com/', 'http://acme.com/a'], 0) == 2
+        assert frontier.add(['http://acme.com/a', 'http://acme.com/b',
+                             'http://acme.com/b'], 1) == 1
+        frontier.mark_seen(['http://acme.com/c'])
+        assert frontier.add(['http://acme.com/c'], 1) == 0
+        assert sorted(url for url, depth in frontier.pop(10)) == [
+            'http://acme.com/', 'http://acme.com/a', 'http://acme.com/b']
+        assert frontier.pop(10) == []
+
+    def test_links_past_the_max_depth_are_dropped(self, redis):
+        """ Nothing is queued more than max_depth links from the seed. """
+        frontier = Frontier.create('http://acme.com/', max_depth=2)
+        assert frontier.add(['http://acme.com/a'], 2) == 1
+        assert frontier.add(['http://acme.com/b'], 3) == 0
+        assert frontier.add([], 1) == 0
+        assert frontier.pop(10) == [('http://acme.com/a', 2)]
+
+    def test_pop_takes_shallow_pages_within_the_budget(self, redis):
+        """ Pages pop best first and stop once the budget is reserved. """
+        frontier = Frontier.create('http://acme.com/', budget=3)
+        frontier.add(['http://acme.com/a/b/c'], 1)
+        frontier.add(['http://acme.com/a', 'http://acme.com/a/b'], 1)
+        frontier.add(['http://acme.com/'], 0)
+        assert frontier.pop(2) == [('http://acme.com/', 0),
+                                   ('http://acme.com/a', 1)]
+        assert frontier.pop(5) == [('http://acme.com/a/b', 1)]
+        assert frontier.pop(5) == []
+        assert redis.zcard(frontier.key('queue')) == 1
+
+    def test_priority(self):
+        """ Depth outweighs path length. """
+        assert priority('http://acme.com/', 0) == 0
+        assert priority('http://acme.com/a/b/', 1) == 1.02
+        assert priority('http://acme.com/a/b/c', 1) < \
+            priority('http://acme.com/', 2)
+
+    def test_redirected_seed_keeps_one_site(self, redis):
+        """ Pages on www or subdomains of a redirected seed share its site. """
+        frontier = Frontier.create('http://acme.com/', 'batch-1')
+        when = datetime(2018, 1, 1)
+        seed = frontier.scan_document('http://acme.com/', {}, when)
+        moved = frontier.scan_document('https://www.acme.com/about', {},
+                                       when)
+        blog = frontier.scan_document('https://blog.acme.com/', {}, when)
+        assert seed['homepage'] == 'http://acme.com'
+        assert moved['homepage'] == blog['homepage'] == seed['homepage']
+        assert moved['uuid'] == blog['uuid'] == seed['uuid']
+        assert moved['url'] == 'https://www.acme.com/about'
+        assert moved['batch_id'] == 'batch-1'
+        assert moved['crawl_id'] == frontier.crawl_id
@@ -0,0 +1,57 @@
+import pytest
+
+from mpscanner.extensions import mongo
+from mpscanner.blueprints.analyze.indexes import ensure_indexes
+
+
+def stages(plan):
+    """
+    Flatten a query plan into the list of its stage names.
+
+    :param plan: Winning plan from an explain
+    :type plan: dict
+    :return: list
+    """
+    found = [plan.get('stage')]
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            found.extend(stages(plan[key]))
+    for child in plan.get('inputStages', []):
+        found.extend(stages(child))
+    return found
+
+
+@pytest.fixture(scope='module')
+def scan(app):
+    """
+    Ensure indexes on a scan collection holding a few pages.
+
+    :param app: Pytest fixture
+    :return: Mongo collection
+    """
+    collection = mongo.db.scan
+    docs = [{'uuid': 'site-{0}'.format(i % 3),
+             'batch_id': 'batch-{0}'.format(i % 2),
+             'homepage': 'http://site-{0}.com'.format(i % 3),
+             'url': 'http://site-{0}.com/{1}'.format(i % 3, i),
+             'crawl_id': 'crawl-{0}'.format(i % 3),
+             'test_fixture': True} for i in range(12)]
+    collection.insert_many(docs)
+    ensure_indexes(mongo.db)
+    yield collection
+    collection.delete_many({'test_fixture': True})
+
+
+class TestIndexes(object):
+    @pytest.mark.parametrize('query', [
+        {'uuid': 'site-1'},
+        {'batch_id': 'batch-1'},
+        {'homepage': 'http://site-2.com'},
+        {'url': 'http://site-1.com/4', 'batch_id': 'batch-0',
+         'crawl_id': 'crawl-1'},
+    ])
+    def test_scan_queries_use_an_index(self, scan, query):
+        """ Report and crawler queries on scan never scan the collection. """
+        plan = scan.find(query).explain()['queryPlanner']['winningPlan']
+        assert 'IXSCAN' in stages(plan)
+        assert 'COLLSCAN' not in stages(plan)
@@ -0,0 +1,14 @@
+from mpscanner.blueprints.analyze.ingest import chunks, normalize_domains
+
+
+class TestIngest(object):
+    def test_domains_are_normalized_and_deduplicated(self):
+        """ Pasted sites become unique homepages in the order given. """
+        lines = ['Example.com', 'http://example.com/about', '  ',
+                 'https://Shop.Example.org/cart?id=1', 'example.com']
+        assert normalize_domains(lines) == ['http://example.com',
+                                            'https://shop.example.org']
+
+    def test_chunks_cover_every_item(self):
+        """ Items are split in order into chunks of at most size. """
+        assert list(chunks([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
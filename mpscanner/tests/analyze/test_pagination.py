@@ -0,0 +1,49 @@
+import pytest
+from pymongo import DESCENDING
+
+from mpscanner.extensions import mongo
+from mpscanner.blueprints.analyze.pagination import paginate
+
+
+@pytest.fixture(scope='module')
+def pages(app):
+    """
+    A collection of pages where several share a sort key.
+
+    :param app: Pytest fixture
+    :return: Mongo collection
+    """
+    collection = mongo.db.pagination_test
+    collection.insert_many([{'n': i, 'group': i // 3, 'body': 'x' * 100}
+                            for i in range(10)])
+    yield collection
+    collection.drop()
+
+
+def walk(collection, **kwargs):
+    seen = []
+    after = None
+    while True:
+        docs, after = paginate(collection, {}, {'n': 1}, after=after,
+                               limit=4, **kwargs)
+        seen.extend(docs)
+        if after is None:
+            return seen
+
+
+class TestPagination(object):
+    def test_pages_cover_every_document_once(self, pages):
+        """ Following cursors visits each document exactly once. """
+        assert [d['n'] for d in walk(pages)] == list(range(10))
+
+    def test_ties_on_the_sort_key_are_kept(self, pages):
+        """ Documents sharing a sort key are not skipped between pages. """
+        docs = walk(pages, key='group', direction=DESCENDING)
+        assert sorted(d['n'] for d in docs) == list(range(10))
+        assert [d['group'] for d in docs] == sorted(
+            [d['group'] for d in docs], reverse=True)
+
+    def test_projection_limits_fields(self, pages):
+        """ Only the projected fields, sort key and _id are read. """
+        docs, _ = paginate(pages, {}, {'n': 1}, key='group')
+        assert set(docs[0]) == {'_id', 'n', 'group'}
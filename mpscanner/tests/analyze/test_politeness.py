@@ -0,0 +1,40 @@
+import pytest
+
+from mpscanner.blueprints.analyze.politeness import parse_crawl_delay
+
+
+class TestPoliteness(object):
+    @pytest.mark.parametrize('robots, expected', [
+        ('User-agent: *\nCrawl-delay: 5', 5.0),
+        ('User-agent: *\nCrawl-delay: 0.5', 0.5),
+        ('User-agent: *\nCrawl-delay: .25 # seconds', 0.25),
+        ('user-agent: *\ncrawl-delay:3', 3.0),
+        ('User-agent: *\nDisallow: /private', None),
+        ('', None),
+        ('User-agent: *\nCrawl-delay: soon', None),
+        ('User-agent: *\nCrawl-delay:', None),
+        ('User-agent: *\nCrawl-delay: -1', None),
+        ('User-agent: *\nCrawl-delay: nan', None),
+        ('User-agent: *\nCrawl-delay: inf', None),
+        ('Crawl-delay 5\nUser-agent: *\nCrawl-delay: 7', 7.0),
+        ('User-agent: *\nCrawl-delay: 4\nCrawl-delay: 9', 4.0),
+        ('User-agent: *\nCrawl-delay: ten\nCrawl-delay: 2', 2.0),
+    ])
+    def test_parse_crawl_delay(self, robots, expected):
+        """ Only the first well formed, finite delay of a group counts. """
+        assert parse_crawl_delay(robots) == expected
+
+    @pytest.mark.parametrize('agent, expected', [
+        ('mpscanner', 1.0),
+        ('MPScanner', 1.0),
+        ('otherbot', 1.0),
+        ('googlebot', 10.0),
+        ('somebot', 30.0),
+    ])
+    def test_named_agents_win_over_the_wildcard(self, agent, expected):
+        """ Groups list several agents and named ones beat the wildcard. """
+        robots = ('User-agent: googlebot\nCrawl-delay: 10\n\n'
+                  'User-agent: mpscanner\nUser-agent: otherbot\n'
+                  'Crawl-delay: 1\n\n'
+                  'User-agent: *\nCrawl-delay: 30\n')
+        assert parse_crawl_delay(robots, agent) == expected
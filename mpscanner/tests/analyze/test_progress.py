@@ -0,0 +1,77 @@
+import json
+
+from mpscanner.blueprints.analyze.progress import BatchProgress
+
+
+class TestBatchProgress(object):
+    def test_counts_pages_through_each_state(self, redis):
+        progress = BatchProgress('batch-1')
+        progress.submitted(2)
+        progress.site_started()
+        progress.queued(3)
+        progress.fetching()
+        progress.fetching()
+        progress.fetching()
+        progress.fetched(100, 0.5)
+        progress.fetched(300, 1.5, unchanged=True)
+        progress.failed()
+        progress.parsed()
+        progress.stored()
+        data = progress.snapshot()
+        assert data['sites'] == 2
+        assert data['sites_started'] == 1
+        assert data['queued'] == 0
+        assert data['fetching'] == 0
+        assert data['fetched'] == 2
+        assert data['extracting'] == 0
+        assert data['unchanged'] == 1
+        assert data['parsed'] == 1
+        assert data['failed'] == 1
+        assert data['stored'] == 1
+        assert data['bytes'] == 400
+        assert data['mean_latency'] == 1.0
+        assert data['batch_id'] == 'batch-1'
+        assert data['done'] is False
+
+    def test_done_once_every_site_started_and_pages_settled(self, redis):
+        progress = BatchProgress('batch-1')
+        progress.submitted(1)
+        progress.site_started()
+        progress.queued(1)
+        progress.fetching()
+        progress.fetched(10, 0.1)
+        assert progress.snapshot()['done'] is False
+        progress.failed(extracting=True)
+        data = progress.snapshot()
+        assert data['extracting'] == 0
+        assert data['done'] is True
+
+    def test_unknown_batch_is_not_done(self, redis):
+        data = BatchProgress('missing').snapshot()
+        assert data['done'] is False
+        assert data['mean_latency'] is None
+        assert data['updated'] is None
+
+    def test_pages_outside_a_batch_are_not_counted(self, redis):
+        BatchProgress(None).queued(5)
+        assert redis.keys('progress:*') == []
+
+    def test_stream_ends_with_done_event(self, redis, monkeypatch):
+        monkeypatch.setattr('time.sleep', lambda seconds: None)
+        progress = BatchProgress('batch-1')
+        progress.submitted(1)
+        progress.site_started()
+        events = list(progress.events())
+        assert len(events) == 1
+        assert events[0].startswith('event: done\ndata: ')
+        assert json.loads(events[0].split('data: ', 1)[1])['done'] is True
+
+    def test_stream_closes_before_limit_for_reconnect(self, redis,
+                                                      monkeypatch):
+        monkeypatch.setattr('time.sleep', lambda seconds: None)
+        progress = BatchProgress('batch-1')
+        progress.submitted(1)
+        events = list(progress.events(limit=0.01))
+        assert events[0].startswith('data: ')
+        assert events[-1] == 'retry: 1000\n\n'
+        assert len(events) == 2
@@ -0,0 +1,95 @@
+import pytest
+
+from lib.potato.fetch import FetchResult
+from mpscanner.extensions import mongo
+from mpscanner.blueprints.analyze import revalidate
+
+URL = 'http://revalidate-test.com/'
+BODY = b'<html><body>Hi</body></html>'
+
+
+class StubFetcher(object):
+    """
+    Answers every fetch with a canned response and records the request
+    headers it was given.
+    """
+
+    def __init__(self, status, headers=None, content=b''):
+        self.status = status
+        self.headers = headers or {}
+        self.content = content
+        self.sent = []
+
+    def fetch(self, url, headers=None, types=None):
+        self.sent.append(headers)
+        return FetchResult(url, self.status, self.headers, self.content,
+                           'utf-8', 0.1, False)
+
+
+@pytest.fixture
+def cache(app):
+    """
+    A page cache holding one stored page, cleaned up afterwards.
+
+    :param app: Pytest fixture
+    :return: Mongo collection
+    """
+    revalidate.store(URL, {'etag': '"v1"', 'last_modified': None},
+                     revalidate.digest(BODY), {'title': 'Hi'},
+                     [URL + 'about'])
+    yield mongo.db.page_cache
+    mongo.db.page_cache.delete_many({'url': URL})
+
+
+def revalidate_page(fetcher, url=URL):
+    cached = revalidate.lookup(url)
+    r = fetcher.fetch(url, revalidate.conditional_headers(cached))
+    return revalidate.unchanged(cached, r, revalidate.digest(r.content))
+
+
+class TestRevalidate(object):
+    @pytest.mark.parametrize('cached, expected', [
+        (None, {}),
+        ({'etag': None, 'last_modified': None}, {}),
+        ({'etag': '"v1"'}, {'If-None-Match': '"v1"'}),
+        ({'etag': '"v1"', 'last_modified': 'Mon, 01 Jan 2018 00:00:00 GMT'},
+         {'If-None-Match': '"v1"',
+          'If-Modified-Since': 'Mon, 01 Jan 2018 00:00:00 GMT'}),
+    ])
+    def test_conditional_headers(self, cached, expected):
+        """ Only validators the server sent last time are sent back. """
+        assert revalidate.conditional_headers(cached) == expected
+
+    def test_validators(self):
+        """ ETag and Last-Modified are read from the response. """
+        r = FetchResult(URL, 200, {'ETag': '"v2"'}, BODY, 'utf-8', 0.1, False)
+        assert revalidate.validators(r) == {'etag': '"v2"',
+                                            'last_modified': None}
+
+    def test_not_modified_reuses_the_extraction(self, cache):
+        """ The stored ETag is sent and a 304 counts as unchanged. """
+        fetcher = StubFetcher(304)
+        assert revalidate_page(fetcher) is True
+        assert fetcher.sent == [{'If-None-Match': '"v1"'}]
+
+    def test_same_body_reuses_the_extraction(self, cache):
+        """ A server ignoring the ETag still matches on the body hash. """
+        assert revalidate_page(StubFetcher(200, content=BODY)) is True
+
+    def test_changed_body_is_extracted(self, cache):
+        assert revalidate_page(StubFetcher(200, content=b'<html/>')) is False
+
+    def test_unknown_page_is_extracted(self, cache):
+        """ A 304 without a cached extraction can't be reused. """
+        fetcher = StubFetcher(304)
+        assert revalidate_page(fetcher, URL + 'new') is False
+        assert fetcher.sent == [{}]
+
+    def test_store_replaces_the_cached_page(self, cache):
+        revalidate.store(URL, {'etag': '"v2"', 'last_modified': None},
+                         revalidate.digest(b'new'), {'title': 'New'}, [])
+        cached = revalidate.lookup(URL)
+        assert cache.count_documents({'url': URL}) == 1
+        assert cached['etag'] == '"v2"'
+        assert cached['crawl_data'] == {'title': 'New'}
+        assert cached['links'] == []
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from mpscanner.extensions import mongo
+from mpscanner.blueprints.analyze import summary
+
+
+@pytest.fixture
+def db(app):
+    """
+    A database with empty test summaries, cleaned up afterwards.
+
+    :param app: Pytest fixture
+    :return: Mongo database
+    """
+    yield mongo.db
+    mongo.db.scan_summary.delete_many({'key': {'$regex': '^summary-test'}})
+
+
+def page(i, batch_id='summary-test-batch'):
+    return {'uuid': 'summary-test-site',
+            'homepage': 'http://summary-test.com',
+            'batch_id': batch_id,
+            'crawl_time': datetime(2018, 1, 1) + timedelta(minutes=i),
+            'crawl_data': {'content_count': 10, 'title_length': i}}
+
+
+class TestSummary(object):
+    def test_pages_add_up_per_site_and_batch(self, db):
+        """ Each write adds to its site and batch summaries. """
+        summary.record_pages(db, [page(0), page(1)])
+        summary.record_pages(db, [page(2, batch_id='')])
+        site = db.scan_summary.find_one({'kind': 'site',
+                                         'key': 'summary-test-site'})
+        batch = db.scan_summary.find_one({'kind': 'batch',
+                                          'key': 'summary-test-batch'})
+        assert site['pages'] == 3
+        assert site['words'] == 30
+        assert site['missing_title'] == 1
+        assert site['homepage'] == 'http://summary-test.com'
+        assert site['last_crawl'] == datetime(2018, 1, 1, 0, 2)
+        assert batch['pages'] == 2
+        assert batch['first_crawl'] == datetime(2018, 1, 1)
+
+    def test_summarize_folds_one_update_per_summary(self):
+        """ A flush of many pages makes one upsert per site and batch. """
+        assert len(summary.summarize([page(i) for i in range(5)])) == 2
+
+    def test_summaries_without_fields_have_no_set(self):
+        """ Batch summaries set no fields, so they send no empty $set. """
+        updates = {u._filter['kind']: u._doc
+                   for u in summary.summarize([page(0)])}
+        assert '$set' not in updates['batch']
+        assert updates['site']['$set'] == {
+            'homepage': 'http://summary-test.com'}
@@ -0,0 +1,64 @@
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from mpscanner.blueprints.analyze.writer import ResultWriter
+
+
+class Collection(object):
+    """
+    A stand-in collection whose bulk_write raises the queued errors, then
+    records what it is given.
+    """
+    full_name = 'test.scan'
+    database = 'test'
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.writes = []
+
+    def bulk_write(self, ops, ordered=True):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.writes.append(ops)
+        return Result(len(ops))
+
+
+class Result(object):
+    def __init__(self, count):
+        self.upserted_ids = {i: i for i in range(count)}
+
+
+class TestResultWriter(object):
+    def test_failed_flush_keeps_the_documents(self):
+        """ A flush that fails keeps every page and counts none stored. """
+        stored = []
+        inserted = []
+        collection = Collection(AutoReconnect('down'))
+        writer = ResultWriter(max_docs=10, max_age=60,
+                              on_insert=lambda db, docs: inserted.extend(docs))
+        for i in range(3):
+            writer.write(collection, {'n': i}, {'n': i},
+                         lambda i=i: stored.append(i))
+        with pytest.raises(AutoReconnect):
+            writer.flush()
+        assert stored == [] and inserted == []
+        assert len(writer.buffer) == 3
+        assert writer.flush() == 3
+        assert stored == [0, 1, 2]
+        assert len(inserted) == 3
+        assert len(collection.writes) == 1
+
+    def test_rejected_documents_are_not_counted(self):
+        """ Pages the server rejects are dropped and not counted stored. """
+        stored = []
+        error = BulkWriteError({'writeErrors': [{'index': 1}],
+                                'upserted': [{'index': 0}, {'index': 2}]})
+        writer = ResultWriter(max_docs=10, max_age=60)
+        collection = Collection(error)
+        for i in range(3):
+            writer.write(collection, {'n': i}, {'n': i},
+                         lambda i=i: stored.append(i))
+        with pytest.raises(BulkWriteError):
+            writer.flush()
+        assert stored == [0, 2]
+        assert writer.buffer == []
@@ -1,19 +1,23 @@
+import fakeredis
 import pytest
 
 from mpscanner.app import create_app
+from mpscanner.extensions import mongo, redis_store
 
 
 @pytest.yield_fixture(scope='session')
 def app():
     """
-    Setup our flask test app, this only gets executed once.
+    Setup our flask test app, this only gets executed once. Tests use
+    their own Mongo database, which is dropped afterwards.
 
     :return: Flask app
     """
     params = {
         'DEBUG': False,
         'TESTING': True,
-        'WTF_CSRF_ENABLED': False
+        'WTF_CSRF_ENABLED': False,
+        'MONGO_DBNAME': 'mpscanner_test'
     }
 
     _app = create_app(settings_override=params)
@@ -24,6 +28,7 @@ def app():
 
     yield _app
 
+    mongo.cx.drop_database(params['MONGO_DBNAME'])
     ctx.pop()
 
 
@@ -36,3 +41,18 @@ def client(app):
     :return: Flask app client
     """
     yield app.test_client()
+
+
+@pytest.yield_fixture(scope='function')
+def redis(app, monkeypatch):
+    """
+    Swap the app's Redis client for an empty in-memory one, which runs Lua
+    scripts too, for each test function.
+
+    :param app: Pytest fixture
+    :param monkeypatch: Pytest fixture
+    :return: Redis client
+    """
+    monkeypatch.setattr(redis_store, '_redis_client',
+                        fakeredis.FakeStrictRedis(decode_responses=True))
+    yield redis_store
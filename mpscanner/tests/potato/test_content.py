@@ -0,0 +1,47 @@
+import pytest
+
+from lib.potato.content import contentStats, syllables
+from lib.potato.lang import contentCount
+
+PASSAGE = '''<html><head><title>Cats</title>
+<script>var ignored = 'not visible text';</script></head>
+<body><p>The cat sat on the mat. The cat was happy!</p></body></html>'''
+
+
+class TestContent(object):
+    @pytest.mark.parametrize('word, expected', [
+        ('cat', 1),
+        ('happy.', 2),
+        ('make', 1),
+        ('table', 2),
+        ('idea', 2),
+        ('beautiful', 3),
+        ('rhythm', 1),
+        ('42', 0),
+        ('', 0),
+    ])
+    def test_syllables(self, word, expected):
+        """ Vowel groups are counted, less a trailing silent e. """
+        assert syllables(word) == expected
+
+    def test_readability_of_a_known_passage(self):
+        """ 11 words, 2 sentences and 12 syllables by the Flesch formulas. """
+        stats = contentStats(PASSAGE, top=2)
+        assert stats['words'] == 11
+        assert stats['unique_words'] == 8
+        assert stats['reading_ease'] == 108.96
+        assert stats['grade_level'] == -0.57
+        assert stats['top_terms'] == [['the', 3], ['cat', 2]]
+        assert 0 < stats['text_html_ratio'] < 1
+
+    def test_words_match_the_content_count(self):
+        """ Stats count the same words as the plain content count. """
+        assert contentStats(PASSAGE)['words'] == contentCount(PASSAGE)
+
+    def test_page_without_text(self):
+        """ Pages without words have no reading level. """
+        stats = contentStats('<html><body></body></html>')
+        assert stats['words'] == 0
+        assert stats['top_terms'] == []
+        assert stats['reading_ease'] is None
+        assert stats['grade_level'] is None
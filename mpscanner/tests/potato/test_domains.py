@@ -0,0 +1,26 @@
+from lib.potato import domains
+
+
+class TestDomains(object):
+    def test_host_handles_loose_urls(self):
+        """ Hosts are found with or without scheme, port or credentials. """
+        assert domains.host('http://user:pw@Shop.Acme.ORG:8080/a?b') == \
+            'shop.acme.org'
+        assert domains.host('acme.com/about') == 'acme.com'
+        assert domains.host('//cdn.acme.com.') == 'cdn.acme.com'
+
+    def test_names_match_one_at_a_time(self):
+        """ The vectorized API agrees with single lookups, in order. """
+        urls = ['https://www.acme.co.uk/x', 'https://blog.acme.com',
+                'https://www.acme.co.uk/y']
+        assert domains.names(urls) == [domains.name(u) for u in urls] == \
+            ['acme', 'acme', 'acme']
+        assert domains.registeredDomains(urls) == \
+            ['acme.co.uk', 'acme.com', 'acme.co.uk']
+
+    def test_repeat_hosts_hit_the_cache(self):
+        """ A hostname is only split once. """
+        domains.name('https://cached.acme.net/a')
+        hits = domains.cacheInfo().hits
+        domains.name('https://cached.acme.net/b')
+        assert domains.cacheInfo().hits == hits + 1
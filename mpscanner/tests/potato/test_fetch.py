@@ -0,0 +1,30 @@
+import pytest
+
+from lib.potato.fetch import FetchResult, mediaType
+
+
+def result(content, encoding):
+    return FetchResult('https://www.acme.com/', 200, {}, content, encoding,
+                       0.1, False)
+
+
+class TestFetch(object):
+    def test_text_uses_the_declared_encoding(self):
+        """ Bodies decode with the charset the server declared. """
+        assert result('café'.encode('latin-1'), 'latin-1').text == 'café'
+
+    def test_text_with_an_unknown_encoding(self):
+        """ An unknown charset falls back to utf-8 instead of raising. """
+        body = 'café \U0001f600'.encode('utf-8')
+        assert result(body, 'utf8mb4').text == 'café \U0001f600'
+        assert result(b'caf\xe9', 'utf8mb4').text == 'caf�'
+
+    @pytest.mark.parametrize('header, expected', [
+        ('text/html; charset=UTF-8', 'text/html'),
+        ('Application/XHTML+XML', 'application/xhtml+xml'),
+        (None, ''),
+    ])
+    def test_media_type(self, header, expected):
+        """ Parameters and case are dropped from the Content-Type. """
+        headers = {'Content-Type': header} if header else {}
+        assert mediaType(headers) == expected
@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+
+from lib.potato.document import Document, PARSERS, DEFAULT_PARSER
+from lib.potato.onpage import PageParse
+from lib.potato.lang import contentCount
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+CORPUS = sorted(os.listdir(FIXTURES))
+# structureData of each fixture from the original html5lib PageParse, before
+# it moved to a single document pass
+EXPECTED = os.path.join(os.path.dirname(__file__), 'expected')
+
+
+def load(fixture):
+    with open(os.path.join(FIXTURES, fixture), encoding='utf-8') as f:
+        return f.read()
+
+
+def structure(fixture, parser):
+    return PageParse(Document(load(fixture), 'https://www.acme.com/',
+                              parser), 'https://www.acme.com/').structureData()
+
+
+class TestParsers(object):
+    def test_default_parser(self):
+        """ lxml is the default parser backend. """
+        assert DEFAULT_PARSER == 'lxml'
+        assert Document(load('empty.html'), '').parser == 'lxml'
+
+    def test_unknown_parser(self):
+        """ Unknown parser backends are rejected. """
+        with pytest.raises(ValueError):
+            Document(load('empty.html'), '', 'regex')
+
+    @pytest.mark.parametrize('fixture', CORPUS)
+    def test_structure_data_parity(self, fixture):
+        """ Every structureData field matches across parser backends. """
+        results = [structure(fixture, parser) for parser in PARSERS]
+        for field in results[0]:
+            for result in results[1:]:
+                assert result[field] == results[0][field], field
+
+    @pytest.mark.parametrize('parser', PARSERS)
+    @pytest.mark.parametrize('fixture', CORPUS)
+    def test_matches_the_original_parse(self, fixture, parser):
+        """ Every fixture extracts what the original PageParse did. """
+        name = os.path.splitext(fixture)[0] + '.json'
+        with open(os.path.join(EXPECTED, name), encoding='utf-8') as f:
+            expected = json.load(f)
+        data = json.loads(json.dumps(structure(fixture, parser)))
+        assert sorted(data) == sorted(expected)
+        for field in expected:
+            assert data[field] == expected[field], field
+
+    @pytest.mark.parametrize('fixture', CORPUS)
+    def test_content_count_parity(self, fixture):
+        """ Word counts match across parser backends. """
+        counts = [contentCount(load(fixture), parser) for parser in PARSERS]
+        assert len(set(counts)) == 1
+
+    def test_homepage_fields(self):
+        """ The fixture homepage is extracted as expected. """
+        for parser in PARSERS:
+            data = structure('homepage.html', parser)
+            assert data['title'] == 'Acme Widgets | Home'
+            assert data['htmlLang'] == 'en-US'
+            assert data['canonical'] == 'https://www.acme.com/'
+            assert data['hreflangOnPage'] == 3
+            assert data['preconnect'] == ['https://fonts.gstatic.com']
+
+    def test_head_only(self):
+        """ Head-only parsing keeps the head and the start of the body. """
+        html = load('homepage.html')
+        filler = '<p>' + 'filler ' * 20000 + '</p>'
+        html = html.replace('</body>', filler + '</body>')
+        for parser in PARSERS:
+            document = Document(html, 'https://www.acme.com/', parser, 1000)
+            assert document.truncated
+            assert len(document.html) < len(html)
+            data = PageParse(document, 'https://www.acme.com/').structureData()
+            assert data['title'] == 'Acme Widgets | Home'
+            assert data['canonical'] == 'https://www.acme.com/'
+
+    def test_head_only_small_page(self):
+        """ Pages within the limit are parsed whole. """
+        html = load('homepage.html')
+        document = Document(html, 'https://www.acme.com/', None, len(html))
+        assert not document.truncated
+        assert document.html == html
@@ -0,0 +1,55 @@
+import pytest
+
+from lib.potato.social import SocialParse
+
+PAGE = '''<html><body><footer>
+<a href="https://twitter.com/@Acme">Twitter</a>
+<a href="https://www.facebook.com/sharer/sharer.php?u=acme">Share</a>
+<a href="https://acme.tumblr.com/">Tumblr</a>
+<a href="https://www.youtube.com/user/AcmeTV">YouTube</a>
+<a href="https://mediumsizedbusiness.com/acme">Partner</a>
+<a href="https://medium.example.com/">Not Medium</a>
+<a href="/about">About</a>
+</footer></body></html>'''
+
+
+class TestSocial(object):
+    @pytest.mark.parametrize('url, platform, handle', [
+        ('https://twitter.com/@Acme', 'twitter', 'acme'),
+        ('https://acme.tumblr.com/', 'tumblr', 'acme'),
+        ('https://www.youtube.com/user/AcmeTV', 'youtube', 'acmetv'),
+        ('https://www.behance.net/acme', 'behance', 'acme'),
+        ('https://www.ebay.co.uk/usr/acme', 'ebay', 'acme'),
+        ('https://plus.google.com/+Acme', 'google', 'acme'),
+        ('https://www.facebook.com/sharer/sharer.php?u=x', 'facebook', None),
+        ('https://en-gb.facebook.com/acme', 'facebook', 'acme'),
+        ('https://es.pinterest.com/acme/', 'pinterest', 'acme'),
+        ('https://acme.blogspot.com/2018/01/post.html', 'blogspot', 'acme'),
+        ('https://acme.wordpress.com/', 'wordpress', 'acme'),
+        ('https://music.youtube.com/channel/acme', 'youtube', 'acme'),
+    ])
+    def test_profiles_are_matched_by_hostname(self, url, platform, handle):
+        """ Known hosts give their platform and a normalized handle. """
+        profile = SocialParse.matcher.match(url)
+        assert profile['platform'] == platform
+        assert profile['handle'] == handle
+
+    @pytest.mark.parametrize('url', [
+        'https://mediumsizedbusiness.com/acme',
+        'https://medium.example.com/',
+        'https://www.acme.com/twitter',
+        'https://business.facebook.com/',
+        'https://l.facebook.com/l.php?u=https%3A%2F%2Facme.com',
+        'https://lm.facebook.com/l.php?u=https%3A%2F%2Facme.com',
+        'https://developers.facebook.com/docs',
+    ])
+    def test_non_profiles_do_not_match(self, url):
+        """ A known name inside another hostname, or a platform host that
+        never holds profiles, is not a match. """
+        assert SocialParse.matcher.match(url) is None
+
+    def test_socialmedia_keys_links_by_platform(self):
+        """ socialmedia maps each platform found to a link. """
+        data = SocialParse(PAGE, 'https://www.acme.com/').socialmedia()
+        assert set(data) == {'url', 'twitter', 'facebook', 'tumblr',
+                             'youtube'}
@@ -0,0 +1,68 @@
+import pytest
+
+from lib.potato.onpage import PageParse
+from lib.potato.urls import (
+    normalize, resolve, discover, canonical, internal)
+
+PAGE = '''<html><head>
+<base href="/shop/">
+<link rel="canonical" href="https://WWW.Acme.com/shop/?utm_source=x">
+</head><body>
+<a href="about">About</a>
+<a href="about/">About again</a>
+<a href="/about#team">Team</a>
+<a href="https://www.acme.com:443/shop/about?utm_medium=email">Email</a>
+<a href="mailto:hi@acme.com">Mail</a>
+<a href="javascript:void(0)">Nothing</a>
+<a href="#top">Top</a>
+<a href="?b=2&a=1">Query</a>
+</body></html>'''
+
+
+class TestUrls(object):
+    @pytest.mark.parametrize('url, expected', [
+        ('HTTP://WWW.Acme.COM', 'http://www.acme.com/'),
+        ('https://acme.com:443/a/', 'https://acme.com/a'),
+        ('http://acme.com:8080/a#b', 'http://acme.com:8080/a'),
+        ('https://acme.com/?b=2&utm_source=x&a=1&gclid=9',
+         'https://acme.com/?a=1&b=2'),
+        ('ftp://acme.com/file', None),
+    ])
+    def test_normalize(self, url, expected):
+        """ Equivalent URLs share one canonical form. """
+        assert normalize(url) == expected
+
+    def test_resolve_skips_non_pages(self):
+        """ Fragments and non http links are not pages. """
+        assert resolve('#top', 'https://acme.com/') is None
+        assert resolve('tel:123', 'https://acme.com/') is None
+        assert resolve('../a', 'https://acme.com/b/c') == \
+            'https://acme.com/a'
+
+    def test_discover_resolves_against_base_and_dedups(self):
+        """ Relative links resolve against <base> and repeats collapse. """
+        page = PageParse(PAGE, 'https://www.acme.com/index.html')
+        assert discover(page) == ['https://www.acme.com/shop/about',
+                                  'https://www.acme.com/about',
+                                  'https://www.acme.com/shop?a=1&b=2']
+
+    def test_canonical_hint(self):
+        """ The declared canonical URL is normalized too. """
+        page = PageParse(PAGE, 'https://www.acme.com/index.html')
+        assert canonical(page) == 'https://www.acme.com/shop'
+
+    def test_internal_after_redirect(self):
+        """ A seed redirected to https and www keeps its links. """
+        page = PageParse('<a href="/about">About</a>'
+                         '<a href="http://acme.com/team">Team</a>'
+                         '<a href="https://blog.acme.com/">Blog</a>'
+                         '<a href="https://other.com/">Other</a>',
+                         'https://www.acme.com/')
+        assert internal(discover(page), 'https://www.acme.com/') == \
+            ['https://www.acme.com/about', 'http://acme.com/team',
+             'https://blog.acme.com/']
+
+    def test_internal_without_registered_domain(self):
+        """ Hosts without a public suffix are compared whole. """
+        assert internal(['http://10.0.0.1/a', 'http://10.0.0.2/a'],
+                        'http://10.0.0.1/') == ['http://10.0.0.1/a']